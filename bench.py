@@ -0,0 +1,283 @@
+"""
+Benchmarks for the render pipeline on synthetic rosters.
+
+Usage:
+    python3 bench.py emitters
+    python3 bench.py emitters --names 50000
+    python3 bench.py parallel --names 100000
+    python3 bench.py layouts
+    python3 bench.py keys --names 100000
+    python3 bench.py sorting --names 100000
+    python3 bench.py server --names 20000
+"""
+import argparse
+from concurrent.futures.process import BrokenProcessPool
+import html
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Callable, List
+
+from data import Content, FullStyling, LayoutConfig, process_names
+from gen import layout_document, plan_document, render_svg_parallel, render_svg_string
+from layouts import LAYOUT_STRATEGIES
+from server import RenderHTTPServer, RenderService, RenderUnixHTTPServer, UnixHTTPConnection, request_render
+from sorting import NameSorter, sort_content
+
+FIRST_NAMES = ["Ana", "Bo", "Chloé", "Dmitri", "Émile", "Fatima", "Gus", "Hana", "Ivan", "Józef", "Kai", "Lena"]
+LAST_NAMES = ["Smith", "Jones", "Åberg", "Öztürk", "Núñez", "Li", "Garcia", "O&#x27;Neil", "Zhang", "Müller"]
+ROLES = ["Ensemble", "Crew", "Stagehand", "Lead", "Lights", "Sound &amp; FX"]
+
+def make_content(names: int, sections: int, include_roles: bool = True, subtitles: int = 2, seed: int = 0) -> Content:
+    """a roster of random (already escaped) names spread over sections of uneven size
+    """
+    rng = random.Random(seed)
+    sizes = [names // sections + (1 if i < names % sections else 0) for i in range(sections)]
+    content_names = []
+    for i, size in enumerate(sizes):
+        section = [f"Section {i}"]
+        for _ in range(size):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            section.append(f"{name}: {rng.choice(ROLES)}" if include_roles else name)
+        content_names.append(section)
+    return Content(content_names, ["Spring Production", "Our Town"][:subtitles], include_roles)
+
+def corpus() -> List[Content]:
+    """small rosters covering every remainder length, roles on and off, subtitle counts and empty strings
+    """
+    contents = []
+    for include_roles in (True, False):
+        for subtitles in range(3):
+            for names in (0, 1, 4, 7, 23, 101):
+                contents.append(make_content(names, max(1, names // 10), include_roles, subtitles, seed=names))
+    contents.append(Content([["Cast", ": ", "Ann: ", ": Lead"], [""]], [""], True))
+    contents.append(Content([["", ""]], ["", ""], False))
+    return contents
+
+def best_of(repeats: int, function: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def bench_emitters(names: int, repeats: int):
+    for content in corpus():
+        for columns in range(1, 8):
+            config = LayoutConfig(columns=columns)
+            styling = FullStyling()
+            assert render_svg_string(content, config, styling, fast=True) == render_svg_string(content, config, styling, fast=False), \
+                f"emitters disagree for {columns} columns on {content}"
+    print(f"emitters agree on {len(corpus())} rosters x 7 column counts")
+
+    content = make_content(names, max(1, names // 500))
+    config = LayoutConfig()
+    styling = FullStyling()
+    slow = best_of(repeats, lambda: render_svg_string(content, config, styling, fast=False))
+    fast = best_of(repeats, lambda: render_svg_string(content, config, styling, fast=True))
+    print(f"{names} names: svg.py {slow * 1000:.1f} ms, templates {fast * 1000:.1f} ms ({slow / fast:.1f}x)")
+
+def bench_parallel(names: int, repeats: int):
+    content = make_content(names, max(2, names // 200))
+    config = LayoutConfig()
+    styling = FullStyling()
+    serial_output = render_svg_string(content, config, styling)
+    for content_small in corpus():
+        assert render_svg_parallel(content_small, config, styling, workers=2, min_names=0) == render_svg_string(content_small, config, styling), \
+            f"parallel render disagrees on {content_small}"
+    assert render_svg_parallel(content, config, styling, workers=2, min_names=0) == serial_output, "parallel render disagrees"
+
+    serial = best_of(repeats, lambda: render_svg_string(content, config, styling))
+    print(f"{names} names in {len(content.names)} sections: serial {serial * 1000:.1f} ms")
+    for workers in (2, 4, 8):
+        parallel = best_of(repeats, lambda: render_svg_parallel(content, config, styling, workers=workers, min_names=0))
+        print(f"  {workers} workers {parallel * 1000:.1f} ms ({serial / parallel:.2f}x)")
+
+def bench_layouts(names: int, repeats: int):
+    styling = FullStyling()
+    for name, strategy in LAYOUT_STRATEGIES.items():
+        for content in corpus():
+            for columns in range(1, 8):
+                config = LayoutConfig(columns=columns, layout_strategy=name)
+                layout = layout_document(content, config, styling)
+                start_ys, planned = plan_document(content, config, styling)
+                assert [section.y for section in layout.sections] == start_ys and planned.height == layout.height, \
+                    f"{name} row_count disagrees with place for {columns} columns on {content}"
+                for section in content.names:
+                    for rows in range(4):
+                        prefix = strategy.prefix_for_rows(section[1:], rows, content.include_roles, config, styling)
+                        assert strategy.row_count(section[1:prefix + 1], content.include_roles, config, styling) <= rows, \
+                            f"{name} prefix_for_rows overfills {rows} rows for {columns} columns"
+    print(f"{len(LAYOUT_STRATEGIES)} strategies agree with their row counts on {len(corpus())} rosters x 7 column counts")
+
+    # packed rows are measured in the fonts being rendered, so bigger names mustn't overlap
+    packed = LAYOUT_STRATEGIES["packed"]
+    large = FullStyling()
+    large.name_style.font_size = large.role_style.font_size = "60px"
+    for content in corpus():
+        config = LayoutConfig(columns=4, layout_strategy="packed")
+        for section in content.names:
+            widths = packed.widths(section[1:], content.include_roles, large)
+            positions = packed.place(section[1:], content.include_roles, config, large)
+            for (width, (x, row)), (next_width, (next_x, next_row)) in zip(zip(widths, positions), zip(widths[1:], positions[1:])):
+                if row == next_row:
+                    assert (next_x - x) * config.name_to_name_horizontal >= (width + next_width) / 2 + packed.padding - 1e-6, \
+                        f"packed names overlap at 60px in {section[0]}"
+    print(f"packed layout leaves room for 60px names on {len(corpus())} rosters")
+
+    content = make_content(names, max(1, names // 500))
+    for name in LAYOUT_STRATEGIES:
+        config = LayoutConfig(layout_strategy=name)
+        layout = best_of(repeats, lambda: layout_document(content, config, styling))
+        print(f"{names} names: {name} {layout * 1000:.1f} ms")
+
+def bench_keys(names: int, repeats: int):
+    """names is the number of calls timed per repeat
+    """
+    config = LayoutConfig(columns=4)
+    styling = FullStyling.with_color("#fa0")
+    frozen_config = config.freeze()
+    frozen_styling = styling.freeze()
+    assert frozen_config.thaw() == config and frozen_styling.thaw() == styling and frozen_styling.to_dict() == styling.to_dict()
+    assert hash(frozen_config) == hash(config.freeze()) and hash(frozen_styling) == hash(styling.freeze())
+    for content in corpus():
+        assert render_svg_string(content, config, styling) == render_svg_string(content, frozen_config, frozen_styling), \
+            f"frozen settings render differently on {content}"
+    print(f"frozen settings render the same on {len(corpus())} rosters")
+
+    def per_call(function: Callable[[], object]) -> float:
+        return best_of(repeats, lambda: [function() for _ in range(names)]) / names * 1e6
+
+    memo = {json.dumps([config.get_all_keys_and_values(), styling.to_dict()], sort_keys=True): None, (frozen_config, frozen_styling): None}
+    cases = [
+        ("stylesheet", lambda: str(styling), lambda: str(frozen_styling)),
+        ("settings dict", config.get_all_keys_and_values, frozen_config.get_all_keys_and_values),
+        ("cache key", lambda: json.dumps([config.get_all_keys_and_values(), styling.to_dict()], sort_keys=True), lambda: hash((frozen_config, frozen_styling))),
+        ("cache lookup", lambda: json.dumps([config.get_all_keys_and_values(), styling.to_dict()], sort_keys=True) in memo, lambda: (frozen_config, frozen_styling) in memo),
+    ]
+    for label, mutable, frozen in cases:
+        before = per_call(mutable)
+        after = per_call(frozen)
+        print(f"{label}: mutable {before:.2f} us, frozen {after:.2f} us ({before / after:.0f}x)")
+    print(f"freezing: config {per_call(config.freeze):.2f} us, styling {per_call(styling.freeze):.2f} us")
+
+def bench_sorting(names: int, repeats: int):
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyzéöåñ"
+    def word() -> str:
+        return "".join(rng.choice(letters) for _ in range(rng.randint(3, 9))).title()
+    entries = [f"{word()} {word()}: {rng.choice(ROLES)}" for _ in range(names)]
+    content = Content([["Cast", *entries]], [], True)
+
+    # * Checks: resort matches a full sort, splits keep every name in order and respect the limit
+    sorter = NameSorter(["last", "first"], True)
+    ordered = sorter.sort(entries)
+    assert sorted(ordered) == sorted(entries)
+    changed = rng.sample(range(len(ordered)), min(10, len(ordered)))
+    for i in changed:
+        ordered[i] = f"{word()} {word()}: {rng.choice(ROLES)}"
+    assert sorter.resort(list(ordered), changed) == sorter.sort(ordered), "resort disagrees with sort"
+    limit = max(1, names // 8)
+    split = sort_content(content, ["last"], split=limit)
+    flattened = [entry for section in split.names for entry in section[1:]]
+    assert flattened == sort_content(content, ["last"]).names[0][1:], "splitting reordered names"
+    for section in split.names:
+        span = section[0][len("Cast ("):-1]
+        assert len(section) - 1 <= limit or "–" not in span, f"{section[0]} has {len(section) - 1} names"
+    crew = Content([["Crew", "Zoe Adams: Crew", "Amy Baker: Crew", "Mia Cole: Cast"]], [], True)
+    assert sort_content(crew, ["role"]).names[0][1:] == ["Mia Cole: Cast", "Zoe Adams: Crew", "Amy Baker: Crew"], "sorting isn't stable"
+    print(f"resort and split agree with a full sort ({len(split.names)} sections of at most {limit} names, or one letter)")
+
+    # * Timings
+    cold = best_of(repeats, lambda: sort_content(content, ["last", "first"]))
+    sorter = NameSorter(["last", "first"], True)
+    sorter.sort(entries)
+    warm = best_of(repeats, lambda: sort_content(content, ["last", "first"], sorter=sorter))
+    ordered = sorter.sort(entries)
+    def resort():
+        for i in changed:
+            ordered[i] = f"{word()} {word()}: {rng.choice(ROLES)}"
+        sorter.resort(ordered, changed)
+    incremental = best_of(repeats, resort)
+    print(f"{names} names: cold {cold * 1000:.0f} ms, cached keys {warm * 1000:.0f} ms, resort of {len(changed)} {incremental * 1000:.2f} ms")
+
+def bench_server(names: int, repeats: int):
+    content = make_content(names, max(1, names // 500))
+    text = "\n\n".join("\n".join(html.unescape(line) for line in section) for section in content.names)
+    layout = {"columns": 4}
+    styling = {"name_style": {"fill": "#000"}}
+    expected = render_svg_string(process_names(text), LayoutConfig.from_dict(layout), FullStyling.from_dict(styling))
+
+    service = RenderService(workers=2)
+    socket_path = os.path.join(tempfile.mkdtemp(), "render.sock")
+    servers = [RenderHTTPServer(("127.0.0.1", 0), service, quiet=True), RenderUnixHTTPServer(socket_path, service, quiet=True)]
+    for httpd in servers:
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = servers[0].server_address[1]
+    connect = [lambda: http.client.HTTPConnection("127.0.0.1", port, timeout=120), lambda: UnixHTTPConnection(socket_path, timeout=120)]
+    try:
+        for transport, new_connection in zip(("tcp", "unix socket"), connect):
+            # * Checks: the same render as in process, bad settings are a 400, identical concurrent requests coalesce
+            connection = new_connection()
+            svg_text, headers = request_render(connection, text, layout, styling)
+            assert svg_text == expected, f"{transport}: the service rendered differently"
+            for bad in ({"columns": 0}, {"columns": "4"}, {"no_such_setting": 1}):
+                try:
+                    request_render(connection, text, bad)
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError(f"{transport}: {bad} was accepted")
+            # the connection is still usable after an error
+            assert request_render(connection, "Section\nName", {})[0].startswith("<svg")
+            # a dead worker breaks the pool; the service starts a new one for the next request
+            try:
+                service.pool.submit(os._exit, 1).result()
+            except BrokenProcessPool:
+                pass
+            assert request_render(connection, text, layout, styling)[0] == expected, f"{transport}: no recovery from a broken pool"
+
+            results = []
+            def render_concurrently():
+                results.append(request_render(new_connection(), text, {"columns": 3}, styling))
+            threads = [threading.Thread(target=render_concurrently) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(results) == 4 and len({svg for svg, _ in results}) == 1, f"{transport}: concurrent renders failed or differ"
+            coalesced = sum(headers["X-Render-Coalesced"] == "1" for _, headers in results)
+            assert coalesced > 0, f"{transport}: no identical in-flight request was coalesced"
+
+            elapsed = best_of(repeats, lambda: request_render(connection, text, layout, styling))
+            print(f"{transport}: renders match, bad settings get 400, a broken pool is replaced, {coalesced} of 4 concurrent requests coalesced; "
+                  f"{names} names in {elapsed * 1000:.0f} ms per request")
+            connection.close()
+    finally:
+        for httpd in servers:
+            httpd.shutdown()
+            httpd.server_close()
+        service.shutdown()
+
+BENCHMARKS = {
+    "emitters": bench_emitters,
+    "parallel": bench_parallel,
+    "layouts": bench_layouts,
+    "keys": bench_keys,
+    "sorting": bench_sorting,
+    "server": bench_server,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the render pipeline.")
+    parser.add_argument("benchmark", choices=BENCHMARKS)
+    parser.add_argument("--names", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args.names, args.repeats)
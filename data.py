@@ -1,10 +1,31 @@
-from dataclasses import dataclass, field, fields
+from array import array
+from dataclasses import asdict, dataclass, field, fields
 import html
-from textwrap import dedent
-from typing import Dict, List, Self
+import mmap
+import re
+from typing import Dict, Iterator, List, Self, Sequence, Tuple
+
+from instrument import timed
+
+class LayoutGeometry:
+    """derived spacing shared by LayoutConfig and FrozenLayoutConfig
+    """
+    __slots__ = ()
+
+    def name_to_name_jump(self, include_roles: bool) -> int:
+        return self.name_to_name_vertical + (self.name_to_role if include_roles else 0)
+
+    def canvas_width(self) -> float:
+        return (self.columns + 0.5) * self.name_to_name_horizontal
+
+    def get_value(self, key: str):
+        return getattr(self, key) if key in LAYOUT_KEYS else None
+
+    def get_all_keys_and_values(self) -> Dict[str, int | str]:
+        return {key: getattr(self, key) for key in LAYOUT_KEYS}
 
 @dataclass
-class LayoutConfig:
+class LayoutConfig(LayoutGeometry):
     columns: int = 5
     name_to_name_vertical: int = 50
     name_to_name_horizontal: int = 220
@@ -14,35 +35,86 @@ class LayoutConfig:
     section_to_sub1: int = 60
     sub1_to_sub2: int = 30
     initial_y: int = 75
-
-    def name_to_name_jump(self, include_roles: bool) -> int:
-        return self.name_to_name_vertical + (self.name_to_role if include_roles else 0)
-    
-    def canvas_width(self) -> float:
-        return (self.columns + 0.5) * self.name_to_name_horizontal
+    # a name in layouts.LAYOUT_STRATEGIES
+    layout_strategy: str = "grid"
 
     # TODO: error if not has?
     def set_value(self, key:str, val:int):
-        if hasattr(self, key):
+        if key in LAYOUT_KEYS:
             setattr(self, key, val)
 
-    def get_value(self, key:str):
-        if hasattr(self, key):
-            return getattr(self, key)
-        return None
-        
-    def get_all_keys_and_values(self) -> Dict[str, int]:
-        output = {}
-        for field in fields(self):
-            output[field.name] = self.get_value(field.name)
-        return output
-    
-    def get_all_defaults(self) -> Dict[str, int]:
+    def get_all_defaults(self) -> Dict[str, int | str]:
         output = {}
         for field in fields(self):
             output[field.name] = field.default
         return output
-    
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, int]) -> Self:
+        unknown = set(values) - {field.name for field in fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown layout settings: {', '.join(sorted(unknown))}")
+        defaults = cls().get_all_keys_and_values()
+        for key, value in values.items():
+            # bool is an int, but never a sensible setting
+            if type(value) is not type(defaults[key]):
+                raise ValueError(f"The layout setting '{key}' must be {'an integer' if isinstance(defaults[key], int) else 'a string'}.")
+        if values.get("columns", 1) < 1:
+            raise ValueError("There must be at least one column.")
+        return cls(**values)
+
+    def freeze(self) -> "FrozenLayoutConfig":
+        return FrozenLayoutConfig(**self.get_all_keys_and_values())
+
+LAYOUT_KEYS: Tuple[str, ...] = tuple(field.name for field in fields(LayoutConfig))
+
+@dataclass(frozen=True, slots=True)
+class FrozenLayoutConfig(LayoutGeometry):
+    """an immutable LayoutConfig that can be passed anywhere one is read; its hash is computed once,
+    so it's an O(1) cache key. dataclasses.replace() makes a new one with a fresh hash
+    """
+    columns: int = 5
+    name_to_name_vertical: int = 50
+    name_to_name_horizontal: int = 220
+    label_to_names: int = 50
+    section_to_section: int = 80
+    name_to_role: int = 20
+    section_to_sub1: int = 60
+    sub1_to_sub2: int = 30
+    initial_y: int = 75
+    layout_strategy: str = "grid"
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_hash", hash(tuple(getattr(self, key) for key in LAYOUT_KEYS)))
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def thaw(self) -> LayoutConfig:
+        return LayoutConfig(**self.get_all_keys_and_values())
+
+def _declarations(style: "TextStyling | FrozenTextStyling") -> str:
+    # plain concatenation: dedent() on every render was a measurable share of small renders
+    return (
+        f"\nfont-family: '{style.font_family}';"
+        f"\nfont-size: {style.font_size};"
+        f"\nfill: {style.fill};"
+        f"\nfont-weight: {style.font_weight};"
+        f"\nfont-style: {style.font_style};\n"
+    )
+
+def _stylesheet(text_styling: "FullStyling | FrozenFullStyling") -> str:
+    indent = " " * 12
+    return (
+        f"\n{indent}.name {{ {text_styling.name_style} }}"
+        f"\n{indent}.role {{ {text_styling.role_style} }}"
+        f"\n{indent}.label {{ {text_styling.label_style} }}"
+        f"\n{indent}.sub1 {{ {text_styling.sub1_style} }}"
+        f"\n{indent}.sub2 {{ {text_styling.sub2_style} }}"
+        f"\n{indent}text {{ text-anchor: middle; }}\n"
+    )
+
 @dataclass
 class TextStyling:
     font_size: str
@@ -52,13 +124,7 @@ class TextStyling:
     font_style: str
 
     def __str__(self):
-        return dedent(f"""
-            font-family: '{self.font_family}';
-            font-size: {self.font_size};
-            fill: {self.fill};
-            font-weight: {self.font_weight};
-            font-style: {self.font_style};
-        """)
+        return _declarations(self)
     
     @classmethod
     def name_defaults(cls) -> Self:
@@ -110,13 +176,50 @@ class TextStyling:
             font_style="normal",
         )
     
-    def update_from_other(self, other: Self):
+    @classmethod
+    def from_dict(cls, values: Dict[str, str], defaults: Self) -> Self:
+        """defaults fills in any property missing from values
+        """
+        unknown = set(values) - {field.name for field in fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown text style properties: {', '.join(sorted(unknown))}")
+        return cls(**{**asdict(defaults), **values})
+
+    def update_from_other(self, other: "TextStyling | FrozenTextStyling"):
         self.fill = other.fill
         self.font_family = other.font_family
         self.font_size = other.font_size
         self.font_style = other.font_style
         self.font_weight = other.font_weight
 
+    def freeze(self) -> "FrozenTextStyling":
+        return FrozenTextStyling(self.font_size, self.fill, self.font_family, self.font_weight, self.font_style)
+
+@dataclass(frozen=True, slots=True)
+class FrozenTextStyling:
+    """an immutable TextStyling with its hash and CSS declarations computed once
+    """
+    font_size: str
+    fill: str
+    font_family: str
+    font_weight: str
+    font_style: str
+    _hash: int = field(init=False, repr=False, compare=False)
+    _css: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_hash", hash((self.font_size, self.fill, self.font_family, self.font_weight, self.font_style)))
+        object.__setattr__(self, "_css", _declarations(self))
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __str__(self):
+        return self._css
+
+    def thaw(self) -> TextStyling:
+        return TextStyling(self.font_size, self.fill, self.font_family, self.font_weight, self.font_style)
+
 
 @dataclass
 class FullStyling:
@@ -146,28 +249,91 @@ class FullStyling:
             sub2_style=sub2_style,
         )
 
+    def to_dict(self) -> Dict[str, Dict[str, str]]:
+        return asdict(self)
+
+    def freeze(self) -> "FrozenFullStyling":
+        return FrozenFullStyling(
+            self.name_style.freeze(),
+            self.role_style.freeze(),
+            self.label_style.freeze(),
+            self.sub1_style.freeze(),
+            self.sub2_style.freeze(),
+        )
+
+    def update_from_other(self, other: "FullStyling | FrozenFullStyling"):
+        self.name_style.update_from_other(other.name_style)
+        self.role_style.update_from_other(other.role_style)
+        self.label_style.update_from_other(other.label_style)
+        self.sub1_style.update_from_other(other.sub1_style)
+        self.sub2_style.update_from_other(other.sub2_style)
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Dict[str, str]]) -> Self:
+        """styles missing from values keep their defaults
+        """
+        defaults = cls()
+        unknown = set(values) - {field.name for field in fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown text styles: {', '.join(sorted(unknown))}")
+        return cls(**{key: TextStyling.from_dict(style, getattr(defaults, key)) for key, style in values.items()})
+
     def __str__(self):
-        return dedent(f"""
-            .name {{ {self.name_style} }}
-            .role {{ {self.role_style} }}
-            .label {{ {self.label_style} }}
-            .sub1 {{ {self.sub1_style} }}
-            .sub2 {{ {self.sub2_style} }}
-            text {{ text-anchor: middle; }}
-        """)
+        return _stylesheet(self)
+
+STYLE_KEYS: Tuple[str, ...] = tuple(field.name for field in fields(FullStyling))
+
+@dataclass(frozen=True, slots=True)
+class FrozenFullStyling:
+    """an immutable FullStyling that can be passed to any emitter; its hash and stylesheet are computed once,
+    so it's an O(1) cache key and str() costs nothing per render. dataclasses.replace() makes a new one with fresh caches
+    """
+    name_style: FrozenTextStyling = field(default_factory=lambda: TextStyling.name_defaults().freeze())
+    role_style: FrozenTextStyling = field(default_factory=lambda: TextStyling.role_defaults().freeze())
+    label_style: FrozenTextStyling = field(default_factory=lambda: TextStyling.label_defaults().freeze())
+    sub1_style: FrozenTextStyling = field(default_factory=lambda: TextStyling.sub1_defaults().freeze())
+    sub2_style: FrozenTextStyling = field(default_factory=lambda: TextStyling.sub2_defaults().freeze())
+    _hash: int = field(init=False, repr=False, compare=False)
+    _css: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_hash", hash(tuple(getattr(self, key) for key in STYLE_KEYS)))
+        object.__setattr__(self, "_css", _stylesheet(self))
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __str__(self):
+        return self._css
+
+    def to_dict(self) -> Dict[str, Dict[str, str]]:
+        output = {}
+        for key in STYLE_KEYS:
+            style = getattr(self, key)
+            output[key] = {name: getattr(style, name) for name in TEXT_STYLE_KEYS}
+        return output
+
+    def thaw(self) -> FullStyling:
+        return FullStyling(*(getattr(self, key).thaw() for key in STYLE_KEYS))
+
+TEXT_STYLE_KEYS: Tuple[str, ...] = tuple(field.name for field in fields(TextStyling))
 
 @dataclass
 class Content:
-    names: List[List[str]]
+    # plain lists, or read-only MappedSections when read with map_names (gen.py); the GUI only ever has lists
+    names: List[List[str] | "MappedSection"]
     subtitles: List[str]
     include_roles: bool
 
+@timed("parse")
 def process_names(names_str: str) -> Content:
     
     names_str = html.escape(names_str)
 
     names = [section.strip() for section in names_str.split("\n\n") if section.strip()]
     names = [section.split("\n") for section in names]
+    if not names:
+        raise ValueError("There are no names.")
 
     subtitles = []
     if names[-1][0].startswith("Subs: "):
@@ -175,6 +341,8 @@ def process_names(names_str: str) -> Content:
         subtitles[0] = subtitles[0].replace("Subs: ", "")
         if len(subtitles) > 2:
             raise ValueError("Subtitles section can only have one line after the 'Subs: ' line.")
+    if not names or len(names[0]) < 2:
+        raise ValueError("The first section has no names.")
 
     include_roles = False
     if ": " in names[0][1]:
@@ -184,3 +352,142 @@ def process_names(names_str: str) -> Content:
         if not all(include_roles == (": " in name) for name in section[1:]):
             raise ValueError(f"Some names include roles and some do not in the section '{section[0]}'. Please make them consistent.")
     return Content(names, subtitles, include_roles)
+
+# * Memory-mapped input
+
+# a byte offset is remembered for every this many lines, for random access into big sections
+CHECKPOINT_STRIDE = 64
+
+# a blank line; \r\n files included
+_SECTION_BREAK = re.compile(rb"\n\r?\n")
+# the start of a line with no ": " in it
+_LINE_WITHOUT_ROLE = re.compile(rb"^(?![^\n]*: )", re.MULTILINE)
+
+# bytes copied at a time when counting lines
+COUNT_CHUNK = 1 << 20
+
+def _count_newlines(data: mmap.mmap, start: int, end: int) -> int:
+    # mmap.count is 3.13+; chunks keep the copies small
+    return sum(data[i:min(i + COUNT_CHUNK, end)].count(b"\n") for i in range(start, end, COUNT_CHUNK))
+
+class MappedSection(Sequence[str]):
+    """the lines of one section of a memory-mapped names file, the title first.
+    Lines are decoded and escaped each time they're read, so nothing but a few offsets is kept in memory
+    """
+    def __init__(self, data: mmap.mmap, start: int, end: int, count: int, first: int = 0, stop: int | None = None, checkpoints: array | None = None):
+        self.data = data
+        # byte range of the whole section, whitespace stripped
+        self.start = start
+        self.end = end
+        # lines in the whole section
+        self.count = count
+        # the lines this (possibly sliced) view covers
+        self.first = first
+        self.stop = count if stop is None else stop
+        # byte offset of every CHECKPOINT_STRIDE-th line, filled in on the first random access far into the section;
+        # slices share the section's array, so it's built once however many pages are cut from it
+        self.checkpoints = array("q") if checkpoints is None else checkpoints
+
+    def __len__(self) -> int:
+        return self.stop - self.first
+
+    def _line_end(self, position: int) -> int:
+        newline = self.data.find(b"\n", position, self.end)
+        return self.end if newline == -1 else newline
+
+    def _offset(self, line: int) -> int:
+        """byte offset of the start of line (counted from the whole section's title)
+        """
+        position = self.start
+        if line >= CHECKPOINT_STRIDE:
+            if not self.checkpoints:
+                for i in range(self.count):
+                    if i % CHECKPOINT_STRIDE == 0:
+                        self.checkpoints.append(position)
+                    position = self._line_end(position) + 1
+            position = self.checkpoints[line // CHECKPOINT_STRIDE]
+            line %= CHECKPOINT_STRIDE
+        for _ in range(line):
+            position = self._line_end(position) + 1
+        return position
+
+    def _decode(self, position: int, line_end: int) -> str:
+        raw = self.data[position:line_end]
+        if raw.endswith(b"\r"):
+            raw = raw[:-1]
+        return html.escape(raw.decode("utf-8"))
+
+    def __iter__(self) -> Iterator[str]:
+        position = self._offset(self.first)
+        for _ in range(len(self)):
+            line_end = self._line_end(position)
+            yield self._decode(position, line_end)
+            position = line_end + 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            first, stop, step = i.indices(len(self))
+            if step != 1:
+                return list(self)[i]
+            return MappedSection(self.data, self.start, self.end, self.count, self.first + first, self.first + max(first, stop), self.checkpoints)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("section index out of range")
+        position = self._offset(self.first + i)
+        return self._decode(position, self._line_end(position))
+
+    def __reduce__(self):
+        # an mmap can't be pickled; other processes get the lines
+        return (list, (list(self),))
+
+    def __repr__(self) -> str:
+        return f"MappedSection({len(self)} lines from byte {self.start})"
+
+@timed("parse")
+def map_names(path: str) -> Content:
+    """reads a names file like process_names, but memory-mapped: sections are found and checked on the raw bytes
+    and names are only decoded when they're used, so memory use doesn't grow with the file
+    """
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(f"'{path}' is empty.") from None
+
+    # * Find sections between blank lines, stripped as process_names strips them
+    names: List[MappedSection] = []
+    breaks = [(match.start(), match.end()) for match in _SECTION_BREAK.finditer(data)]
+    for (_, start), (end, _) in zip([(0, 0), *breaks], [*breaks, (len(data), len(data))]):
+        while start < end and data[start:start + 1].isspace():
+            start += 1
+        while end > start and data[end - 1:end].isspace():
+            end -= 1
+        if start < end:
+            names.append(MappedSection(data, start, end, _count_newlines(data, start, end) + 1))
+    if not names:
+        raise ValueError(f"'{path}' has no names.")
+
+    subtitles = []
+    if names[-1][0].startswith("Subs: "):
+        subtitles = list(names.pop())
+        subtitles[0] = subtitles[0].replace("Subs: ", "")
+        if len(subtitles) > 2:
+            raise ValueError("Subtitles section can only have one line after the 'Subs: ' line.")
+    if not names or len(names[0]) < 2:
+        raise ValueError("The first section has no names.")
+
+    include_roles = ": " in names[0][1]
+
+    for section in names:
+        # names start after the title's line
+        names_start = section._line_end(section.start) + 1
+        if names_start >= section.end:
+            continue
+        if include_roles:
+            consistent = _LINE_WITHOUT_ROLE.search(data, names_start, section.end) is None
+        else:
+            consistent = data.find(b": ", names_start, section.end) == -1
+        if not consistent:
+            raise ValueError(f"Some names include roles and some do not in the section '{section[0]}'. Please make them consistent.")
+    return Content(names, subtitles, include_roles)
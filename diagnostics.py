@@ -0,0 +1,171 @@
+"""
+Resource tracking for long sessions: Python allocations (tracemalloc), process RSS and
+live Qt objects, sampled after every render.
+
+Every SNAPSHOT_EVERY samples a tracemalloc snapshot is compared with the previous one,
+and the source lines whose allocations grew the most are kept, which is usually enough
+to find what a slow creep is holding on to. Live Qt objects are counted by class at the
+same time.
+
+Usage:
+    diagnostics = Diagnostics()
+    diagnostics.start()
+    ...render...
+    diagnostics.sample("render")
+    print(diagnostics.report())
+    diagnostics.dump("resources.json")
+"""
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field
+import gc
+import json
+import os
+import time
+import tracemalloc
+from typing import Deque, Dict, List, Tuple
+
+# samples kept, so tracking a long session doesn't itself grow without bound
+MAX_SAMPLES = 5000
+# samples between tracemalloc snapshots (and Qt object counts by class)
+SNAPSHOT_EVERY = 50
+# source lines kept from each snapshot comparison
+TOP_GROWTH = 10
+
+def rss_bytes() -> int:
+    """the resident set size of this process; where that can't be read, the peak instead (0 if neither can)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+def qt_object_counts() -> Counter:
+    """live Qt wrapper objects by class; walks every tracked Python object, so it isn't free
+    """
+    from shiboken6 import Shiboken
+
+    return Counter(type(o).__name__ for o in gc.get_objects() if isinstance(o, Shiboken.Object))
+
+def _megabytes(count: int) -> str:
+    return f"{count / 2**20:.1f} MB"
+
+@dataclass
+class ResourceSample:
+    # seconds since tracking started
+    time: float
+    label: str
+    rss: int
+    # bytes allocated by Python and still alive, and the most there have been since the last sample
+    traced: int
+    traced_peak: int
+    # Qt wrapper objects alive, counted at snapshots only (None between them)
+    qt_objects: int | None = None
+
+@dataclass
+class Growth:
+    """a snapshot comparison: the source lines whose live allocations grew the most
+    """
+    sample: int
+    # (file:line, bytes grown, allocations grown)
+    lines: List[Tuple[str, int, int]]
+    # Qt classes whose live object count changed
+    qt_classes: Dict[str, int] = field(default_factory=dict)
+
+class Diagnostics:
+    def __init__(self, frames: int = 1, snapshot_every: int = SNAPSHOT_EVERY):
+        # traceback depth tracemalloc records; more finds callers but slows every allocation
+        self.frames = frames
+        self.snapshot_every = snapshot_every
+        self.samples: Deque[ResourceSample] = deque(maxlen=MAX_SAMPLES)
+        self.growth: Deque[Growth] = deque(maxlen=MAX_SAMPLES // snapshot_every + 1)
+        self.sample_count = 0
+        self.start_time = 0.0
+        self.started_tracing = False
+        self.last_snapshot: tracemalloc.Snapshot | None = None
+        self.last_qt_counts: Counter = Counter()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_tracing = True
+        self.start_time = time.perf_counter()
+        self.last_snapshot = self.snapshot()
+        self.last_qt_counts = qt_object_counts()
+
+    def stop(self):
+        """stops tracemalloc if start() started it; samples are kept
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        self.last_snapshot = None
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def sample(self, label: str = "render") -> ResourceSample:
+        """records current usage; every snapshot_every samples also compares allocations and Qt objects with the last snapshot
+        """
+        traced, traced_peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        sample = ResourceSample(time.perf_counter() - self.start_time, label, rss_bytes(), traced, traced_peak)
+        self.sample_count += 1
+
+        if self.sample_count % self.snapshot_every == 0:
+            qt_counts = qt_object_counts()
+            sample.qt_objects = sum(qt_counts.values())
+            changed = {name: qt_counts[name] - self.last_qt_counts[name] for name in qt_counts | self.last_qt_counts if qt_counts[name] != self.last_qt_counts[name]}
+            self.last_qt_counts = qt_counts
+            lines = []
+            if self.last_snapshot is not None and tracemalloc.is_tracing():
+                snapshot = self.snapshot()
+                for stat in snapshot.compare_to(self.last_snapshot, "lineno")[:TOP_GROWTH]:
+                    if stat.size_diff > 0:
+                        frame = stat.traceback[0]
+                        lines.append((f"{frame.filename}:{frame.lineno}", stat.size_diff, stat.count_diff))
+                self.last_snapshot = snapshot
+            self.growth.append(Growth(self.sample_count, lines, changed))
+
+        self.samples.append(sample)
+        return sample
+
+    def report(self) -> str:
+        """RSS, Python allocations and Qt objects from the first sample to the last, and where allocations last grew
+        """
+        if not self.samples:
+            return "No samples yet."
+        first, last = self.samples[0], self.samples[-1]
+        counted = [sample for sample in self.samples if sample.qt_objects is not None]
+        lines = [
+            f"{self.sample_count} samples over {last.time:.0f} s",
+            f"RSS: {_megabytes(first.rss)} -> {_megabytes(last.rss)} (max {_megabytes(max(sample.rss for sample in self.samples))})",
+            f"Python allocations: {_megabytes(first.traced)} -> {_megabytes(last.traced)} (peak {_megabytes(max(sample.traced_peak for sample in self.samples))})",
+        ]
+        if counted:
+            lines.append(f"Qt objects: {counted[0].qt_objects} -> {counted[-1].qt_objects}")
+        recent = next((growth for growth in reversed(self.growth) if growth.lines or growth.qt_classes), None)
+        if recent is not None:
+            lines.append(f"Growth over the {self.snapshot_every} samples before sample {recent.sample}:")
+            lines.extend(f"  {where}: +{size / 1024:.1f} KB in {count:+d} blocks" for where, size, count in recent.lines)
+            lines.extend(f"  {name}: {change:+d} objects" for name, change in sorted(recent.qt_classes.items()))
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        return json.dumps({"samples": [asdict(sample) for sample in self.samples], "growth": [asdict(growth) for growth in self.growth]}, indent=2)
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.to_json())
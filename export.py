@@ -0,0 +1,110 @@
+"""
+PNG and PDF export straight from rendered SVG text, with no files in between.
+
+Works headlessly: without a running Qt application one is created on the
+offscreen platform.
+
+This module and outlines import Qt when they're imported. Everything else imports
+them (and shiboken6) only where they're used, so plain SVG rendering works without
+Qt installed and doesn't pay for loading it.
+
+Usage:
+    png_bytes = export_png(svg_text, dpi=300)
+    export_pdf(svg_text, "proof.pdf")
+    export_many([(page, f"page-{i}.png") for i, page in enumerate(pages)], "png")
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+from typing import List, Tuple
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QMarginsF, QRectF, QSizeF
+from PySide6.QtGui import QGuiApplication, QImage, QPageLayout, QPageSize, QPainter, QPdfWriter
+from PySide6.QtSvg import QSvgRenderer
+
+# SVG user units are CSS pixels
+SVG_DPI = 96
+
+# the application started by ensure_gui_application, kept alive for the process
+headless_app = None
+
+def ensure_gui_application():
+    """font and painting support need a QGuiApplication; start an offscreen one if nothing is running
+    """
+    global headless_app
+    if QGuiApplication.instance() is None:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        headless_app = QGuiApplication([])
+
+def load_renderer(svg_text: str) -> QSvgRenderer:
+    ensure_gui_application()
+    renderer = QSvgRenderer(QByteArray(svg_text.encode()))
+    if not renderer.isValid():
+        raise ValueError("The SVG could not be loaded for export.")
+    return renderer
+
+def _finish(data: QByteArray, path: str | None) -> bytes:
+    if path:
+        with open(path, "wb") as f:
+            f.write(data.data())
+    return data.data()
+
+def export_png(svg_text: str, path: str | None = None, dpi: int = 300) -> bytes:
+    """rasterizes the SVG at dpi; returns the PNG bytes and writes them to path if given
+    """
+    renderer = load_renderer(svg_text)
+    size = renderer.defaultSize() * (dpi / SVG_DPI)
+    image = QImage(size, QImage.Format.Format_ARGB32_Premultiplied)
+    if image.isNull():
+        raise ValueError(f"A {size.width()}x{size.height()} image is too large; lower the DPI or paginate the output.")
+    image.fill(0)
+    dots_per_meter = round(dpi / 0.0254)
+    image.setDotsPerMeterX(dots_per_meter)
+    image.setDotsPerMeterY(dots_per_meter)
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+    renderer.render(painter)
+    painter.end()
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    buffer.close()
+    return _finish(data, path)
+
+def export_pdf(svg_text: str, path: str | None = None) -> bytes:
+    """writes the SVG as a single vector PDF page of the same size; returns the PDF bytes and writes them to path if given
+    """
+    renderer = load_renderer(svg_text)
+    size = renderer.defaultSize()
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    writer = QPdfWriter(buffer)
+    writer.setResolution(SVG_DPI)
+    page_size = QPageSize(QSizeF(size.width() * 72 / SVG_DPI, size.height() * 72 / SVG_DPI), QPageSize.Unit.Point)
+    writer.setPageLayout(QPageLayout(page_size, QPageLayout.Orientation.Portrait, QMarginsF(0, 0, 0, 0)))
+
+    painter = QPainter(writer)
+    renderer.render(painter, QRectF(0, 0, size.width(), size.height()))
+    painter.end()
+    buffer.close()
+    return _finish(data, path)
+
+def export_many(jobs: List[Tuple[str, str]], format: str, dpi: int = 300, workers: int | None = None):
+    """exports (svg_text, path) jobs concurrently; format is "png" or "pdf".
+    QImage and QPdfWriter painting happens outside the GUI thread, so threads share the fonts loaded once
+    """
+    if format not in ("png", "pdf"):
+        raise ValueError(f"Unknown export format '{format}'.")
+    ensure_gui_application()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if format == "png":
+            futures = [pool.submit(export_png, svg_text, path, dpi) for svg_text, path in jobs]
+        else:
+            futures = [pool.submit(export_pdf, svg_text, path) for svg_text, path in jobs]
+        for future in futures:
+            future.result()
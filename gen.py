@@ -6,150 +6,640 @@ Usage:
     python3 examples/text.py > examples/text.svg
     chromium examples/text.svg
 """
+import argparse
+import asyncio
+from collections import Counter, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+import os
 import sys
-from typing import List, Tuple
+from typing import Deque, Dict, Iterator, List, Tuple
 import svg
 
-from data import Content, FullStyling, LayoutConfig, process_names
+from data import Content, FullStyling, LayoutConfig, map_names, process_names
+from instrument import profile_report, profiled, render_stats, timed
+from layouts import LAYOUT_STRATEGIES, get_layout
+from sorting import SORT_FIELDS, set_collation_locale, sort_content
 
 
-def positions_for_remainder(len_remainder, columns: int) -> List[float]:
-    return [((columns - len_remainder) / 2) + i for i in range(len_remainder)]
-
 def column_x(i: float, config: LayoutConfig) -> float:
     return (config.canvas_width() / 2) + ((i - ((config.columns - 1) / 2)) * config.name_to_name_horizontal)
 
-def construct_name_group(name: str, index: float, current_y: int, include_roles: bool, config: LayoutConfig) -> svg.G | svg.Text:
+@dataclass(slots=True)
+class PlacedName:
+    name: str
+    role: str | None
+    x: float
+    y: int
+
+@dataclass
+class SectionLayout:
+    # None for a continuation of a section split across pages without repeating its label
+    title: str | None
+    x: float
+    y: int
+    # names grouped by the integer column they sit in, in row order
+    columns: List[List[PlacedName]]
+    # names of the last row that fall between columns
+    remainder: List[PlacedName]
+
+@dataclass
+class DocumentLayout:
+    width: float
+    height: int
+    sections: List[SectionLayout]
+    # (text, x, y, css class)
+    subtitles: List[Tuple[str, float, int, str]]
+
+def place_name(name: str, index: float, current_y: int, include_roles: bool, config: LayoutConfig) -> PlacedName:
+    role = None
     if include_roles:
         name, role = name.split(": ", 1)
+    return PlacedName(name, role, column_x(index, config), current_y)
+
+def layout_section(section: List[str], include_roles: bool, current_y: int, config: LayoutConfig, text_styling: FullStyling, label: bool = True) -> Tuple[SectionLayout, int]:
+        
+        # * Prepare variables
+        canvas_width = config.canvas_width()
+        title = section[0]
+        names = section[1:]
+        positions = get_layout(config.layout_strategy).place(names, include_roles, config, text_styling)
+
+        # * Place header
+        layout = SectionLayout(title if label else None, canvas_width/2, current_y, [[] for _ in range(config.columns)], [])
+        current_y += config.label_to_names if label else 0
+
+        # * Place names where the strategy put them
+        jump = config.name_to_name_jump(include_roles)
+        rows = 0
+        for name, (column, row) in zip(names, positions):
+            placed = place_name(name, column, current_y + row * jump, include_roles, config)
+            if column % 1 == 0 and 0 <= column < config.columns:
+                layout.columns[int(column)].append(placed)
+            else:
+                layout.remainder.append(placed)
+            if row >= rows:
+                rows = row + 1
+
+        # * Wrap up
+        current_y += max(rows - 1, 0) * jump
+        current_y += config.name_to_role if include_roles else 0
+
+        return (layout, current_y)
+
+def layout_document(content: Content, config: LayoutConfig, text_styling: FullStyling) -> DocumentLayout:
+    
+    current_y = config.initial_y
+
+    # * Lay out sections of names with header
+    sections = []
+    for section in content.names:
+        section_layout, current_y = layout_section(section, content.include_roles, current_y, config, text_styling)
+        sections.append(section_layout)
+        current_y += config.section_to_section
+
+    subtitles, current_y = layout_subtitles(content.subtitles, current_y, config)
+
+    return DocumentLayout(config.canvas_width(), current_y + 50, sections, subtitles)
+
+def layout_subtitles(subtitles: List[str], current_y: int, config: LayoutConfig) -> Tuple[List[Tuple[str, float, int, str]], int]:
+    placed = []
+    for i, subtitle in enumerate(subtitles):
+        current_y += config.section_to_sub1 - config.section_to_section if i == 0 else config.sub1_to_sub2
+        placed.append((subtitle, config.canvas_width()/2, current_y, "sub" + str(i+1)))
+    return (placed, current_y)
+
+def section_end_y(rows: int, include_roles: bool, current_y: int, config: LayoutConfig, label: bool = True) -> int:
+    """where layout_section would leave current_y for a section taking rows rows, without placing its names
+    """
+    current_y += (config.label_to_names if label else 0) + max(rows - 1, 0) * config.name_to_name_jump(include_roles)
+    return current_y + (config.name_to_role if include_roles else 0)
+
+# * svg.py emitter
 
+def construct_name_group(placed: PlacedName, config: LayoutConfig) -> svg.G | svg.Text:
     to_return = svg.Text(
-            x=column_x(index, config),
-            y=current_y,
-            text=name,
+            x=placed.x,
+            y=placed.y,
+            text=placed.name,
             class_=["name"],
         )
 
-    if include_roles:
+    if placed.role is not None:
         to_return = svg.G(elements=[
         to_return,
         svg.Text(
-            x=column_x(index, config),
-            y=current_y + config.name_to_role,
-            text=role,
+            x=placed.x,
+            y=placed.y + config.name_to_role,
+            text=placed.role,
             class_=["role"],
         ),
     ])
         
     return to_return
 
-def process_section(section: List[str], include_roles: bool, current_y: int, config: LayoutConfig) -> Tuple[svg.G, int]:
-        
-        # * Prepare variables
-        columns = config.columns
-        canvas_width = config.canvas_width()
-        remainder_layouts = [positions_for_remainder(i, columns) for i in range(columns)]
-
-        section = section.copy()
-        title = section.pop(0)
-        core_block = section[0:len(section) - len(section) % columns]
-        remainder = section[len(core_block):]
-
-        # * Construct header SVG
-        title_text = svg.Text(
-            x=canvas_width/2,
-            y=current_y,
-            text=title,
-            class_=["label"],
-        )
-        current_y += config.label_to_names
+def construct_section(layout: SectionLayout, config: LayoutConfig) -> svg.G:
+    title_texts = [] if layout.title is None else [svg.Text(
+        x=layout.x,
+        y=layout.y,
+        text=layout.title,
+        class_=["label"],
+    )]
+    columns_groups = [ svg.G(elements=[construct_name_group(placed, config) for placed in col]) for col in layout.columns ]
+    remainder_texts = [ construct_name_group(placed, config) for placed in layout.remainder ]
+    return svg.G(elements=[*title_texts, *columns_groups, *remainder_texts])
 
-        # * Construct names SVG in core block
-        text_columns = [[] for _ in range(columns)]
+def process_section(section: List[str], include_roles: bool, current_y: int, config: LayoutConfig, text_styling: FullStyling) -> Tuple[svg.G, int]:
+    layout, current_y = layout_section(section, include_roles, current_y, config, text_styling)
+    return (construct_section(layout, config), current_y)
 
-        for i, name in enumerate(core_block):
-            if i % columns == 0 and i != 0:
-                current_y += config.name_to_name_jump(include_roles)
-            column = i % columns
+def render_svg(content: Content, config: LayoutConfig, text_styling: FullStyling) -> svg.SVG:
+    
+    with timed("layout"):
+        layout = layout_document(content, config, text_styling)
 
-            to_append = construct_name_group(name, column, current_y, include_roles, config)
-            
-            text_columns[column].append(to_append)
+    # * Construct SVG document
+    with timed("build"):
+        all_elements: List[svg.Element] = [construct_section(section, config) for section in layout.sections]
+        for text, x, y, class_ in layout.subtitles:
+            all_elements.append(svg.Text(x=x, y=y, text=text, class_=[class_]))
+
+        document= svg.SVG(
+            width=layout.width,
+            height=layout.height,
+            elements=[
+                svg.Style(
+                    text=str(text_styling),
+                ),            
+                *all_elements
+            ],
+        )
         
-        # * Construct names SVG in remainder line
-        remainder_texts = []
-        len_remainder = len(remainder)
-        if len_remainder > 0:
-            current_y += config.name_to_name_jump(include_roles) if len(core_block) > 0 else 0
-            layout = remainder_layouts[len_remainder]
-            for i, name in enumerate(remainder): 
-                to_append = construct_name_group(name, layout[i], current_y, include_roles, config)
-            
-                if layout[i].is_integer():
-                    text_columns[int(layout[i])].append(to_append)
-                else:
-                    remainder_texts.append(to_append)
+    return document
 
-        # * Wrap up
-        current_y += config.name_to_role if include_roles else 0
+# * String template emitter, producing the same markup as str(render_svg(...)) without building an svg.py tree
 
-        columns_groups = [ svg.G(elements=col) for col in text_columns ]
+_TEXT = '<text class="{}" x="{}" y="{}">{}</text>'.format
+_EMPTY_TEXT = '<text class="{}" x="{}" y="{}"/>'.format
+_NAME = '<text class="name" x="{}" y="{}">{}</text>'.format
+_NAME_AND_ROLE = '<g><text class="name" x="{0}" y="{1}">{3}</text><text class="role" x="{0}" y="{2}">{4}</text></g>'.format
 
-        return (svg.G(elements=[title_text, *columns_groups, *remainder_texts]), current_y)
+def emit_text(class_: str, x: float, y: int, text: str) -> str:
+    return _TEXT(class_, x, y, text) if text else _EMPTY_TEXT(class_, x, y)
 
+def emit_name_group(placed: PlacedName, config: LayoutConfig) -> str:
+    if placed.role is None:
+        return _NAME(placed.x, placed.y, placed.name) if placed.name else _EMPTY_TEXT("name", placed.x, placed.y)
+    if placed.name and placed.role:
+        return _NAME_AND_ROLE(placed.x, placed.y, placed.y + config.name_to_role, placed.name, placed.role)
+    return "<g>" + emit_text("name", placed.x, placed.y, placed.name) + emit_text("role", placed.x, placed.y + config.name_to_role, placed.role) + "</g>"
 
-def render_svg(content: Content, config: LayoutConfig, text_styling: FullStyling) -> svg.SVG:
-    
-    current_y = config.initial_y
+def emit_section(layout: SectionLayout, config: LayoutConfig, shared: Dict[Tuple[str, str], str] | None = None) -> str:
+    if shared is None:
+        text, name_group = emit_text, emit_name_group
+    else:
+        text = lambda class_, x, y, content: emit_shared_text(class_, x, y, content, shared)
+        name_group = lambda placed, config: emit_shared_name_group(placed, config, shared)
+
+    parts = ["<g>"] if layout.title is None else ["<g>", text("label", layout.x, layout.y, layout.title)]
+    for col in layout.columns:
+        if col:
+            parts.append("<g>")
+            parts.extend(name_group(placed, config) for placed in col)
+            parts.append("</g>")
+        else:
+            parts.append("<g/>")
+    parts.extend(name_group(placed, config) for placed in layout.remainder)
+    parts.append("</g>")
+    return "".join(parts)
+
+def emit_header(layout: DocumentLayout, text_styling: FullStyling, xlink: bool = False) -> str:
+    style = str(text_styling)
+    namespaces = ' xmlns:xlink="http://www.w3.org/1999/xlink"' if xlink else ""
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg"{namespaces} width="{layout.width}" height="{layout.height}">'
+        + (f"<style>{style}</style>" if style else "<style/>")
+    )
+
+def emit_footer(layout: DocumentLayout) -> str:
+    return "".join(emit_text(class_, x, y, text) for text, x, y, class_ in layout.subtitles) + "</svg>"
+
+def emit_svg(layout: DocumentLayout, config: LayoutConfig, text_styling: FullStyling, dedup_threshold: int = 0) -> str:
+    """dedup_threshold > 0 defines strings repeated at least that often once and places them with <use>
+    """
+    if dedup_threshold > 0:
+        shared = plan_shared_text(layout, dedup_threshold)
+        if shared:
+            parts = [emit_header(layout, text_styling, xlink=True), emit_shared_defs(shared)]
+            parts.extend(emit_section(section, config, shared) for section in layout.sections)
+            parts.append(emit_footer(layout))
+            return "".join(parts)
+
+    parts = [emit_header(layout, text_styling)]
+    parts.extend(emit_section(section, config) for section in layout.sections)
+    parts.append(emit_footer(layout))
+    return "".join(parts)
+
+# * Shared strings: text repeated often enough (roles like "Ensemble" or "Crew") is defined once and placed with <use>
+
+_USE = '<use xlink:href="#{}" x="{}" y="{}"/>'.format
+_SHARED_TEXT = '<text id="{}" class="{}">{}</text>'.format
+
+def plan_shared_text(layout: DocumentLayout, threshold: int) -> Dict[Tuple[str, str], str]:
+    """maps (css class, text) to a def id for every string seen at least threshold times
+    whose <use>s save more markup than its definition costs
+    """
+    counts: Counter[Tuple[str, str]] = Counter()
+    for section in layout.sections:
+        if section.title:
+            counts["label", section.title] += 1
+        for column in [*section.columns, section.remainder]:
+            for placed in column:
+                counts["name", placed.name] += 1
+                if placed.role is not None:
+                    counts["role", placed.role] += 1
+
+    shared = {}
+    for (class_, text), count in counts.most_common():
+        if count < threshold:
+            break
+        if not text:
+            continue
+        def_id = f"t{len(shared)}"
+        # a <use> drops the class and text of a <text> but adds the reference
+        saving = len(class_) + len(text) + 1 - len(def_id)
+        if count * saving > len(_SHARED_TEXT(def_id, class_, text)):
+            shared[class_, text] = def_id
+    return shared
 
-    # * Construct sections of names with header
-    all_elements = []
+def emit_shared_defs(shared: Dict[Tuple[str, str], str]) -> str:
+    return "<defs>" + "".join(_SHARED_TEXT(def_id, class_, text) for (class_, text), def_id in shared.items()) + "</defs>"
+
+def emit_shared_text(class_: str, x: float, y: int, text: str, shared: Dict[Tuple[str, str], str]) -> str:
+    def_id = shared.get((class_, text))
+    return _USE(def_id, x, y) if def_id else emit_text(class_, x, y, text)
+
+def emit_shared_name_group(placed: PlacedName, config: LayoutConfig, shared: Dict[Tuple[str, str], str]) -> str:
+    name = emit_shared_text("name", placed.x, placed.y, placed.name, shared)
+    if placed.role is None:
+        return name
+    return "<g>" + name + emit_shared_text("role", placed.x, placed.y + config.name_to_role, placed.role, shared) + "</g>"
+
+def render_svg_string(
+    content: Content,
+    config: LayoutConfig,
+    text_styling: FullStyling,
+    fast: bool = True,
+    outline_text: bool = False,
+    dedup_threshold: int = 0,
+) -> str:
+    """renders the document straight to markup; fast selects the string template emitter,
+    otherwise the svg.py tree is built and serialized. outline_text replaces text with cached glyph outlines.
+    dedup_threshold > 0 (template emitter only) places strings repeated that often with <use>
+    """
+    if dedup_threshold > 0 and not fast:
+        raise ValueError("Shared strings are only supported by the template emitter.")
+
+    if outline_text:
+        from outlines import emit_outlined_svg
+        with timed("layout"):
+            layout = layout_document(content, config, text_styling)
+        with timed("serialize"):
+            return emit_outlined_svg(layout, config, text_styling)
+
+    if not fast:
+        document = render_svg(content, config, text_styling)
+        with timed("serialize"):
+            return str(document)
+
+    with timed("layout"):
+        layout = layout_document(content, config, text_styling)
+    with timed("serialize"):
+        return emit_svg(layout, config, text_styling, dedup_threshold)
+
+
+
+# * Process-parallel rendering of sections
+
+def plan_document(content: Content, config: LayoutConfig, text_styling: FullStyling) -> Tuple[List[int], DocumentLayout]:
+    """each section's starting y plus the document's size and subtitles, without laying out any names;
+    the returned layout has no sections
+    """
+    strategy = get_layout(config.layout_strategy)
+    start_ys = []
+    current_y = config.initial_y
     for section in content.names:
-        svg_section, current_y = process_section(section, content.include_roles, current_y, config)
-        all_elements.append(svg_section)
-        current_y += config.section_to_section
+        start_ys.append(current_y)
+        rows = strategy.row_count(section[1:], content.include_roles, config, text_styling)
+        current_y = section_end_y(rows, content.include_roles, current_y, config) + config.section_to_section
+    subtitles, current_y = layout_subtitles(content.subtitles, current_y, config)
+    return (start_ys, DocumentLayout(config.canvas_width(), current_y + 50, [], subtitles))
 
-    # * Construct subtitles
-    for i, subtitle in enumerate(content.subtitles):
-        current_y += config.section_to_sub1 - config.section_to_section if i == 0 else config.sub1_to_sub2
-        subtitle_text = svg.Text(
-            x=config.canvas_width()/2,
-            y=current_y,
-            text=subtitle,
-            class_=["sub" + str(i+1)],
-        )
-        all_elements.append(subtitle_text)
+# below this many names, process start-up and pickling cost more than they save
+PARALLEL_MIN_NAMES = 20000
 
-    # * Construct SVG document
-    document= svg.SVG(
-        width=config.canvas_width(),
-        height=current_y + 50,
-        elements=[
-            svg.Style(
-                text=str(text_styling),
-            ),            
-            *all_elements
-        ],
+def _render_sections(sections: List[List[str]], start_ys: List[int], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> str:
+    """worker side of render_svg_parallel: lays out and emits a run of consecutive sections
+    """
+    return "".join(
+        emit_section(layout_section(section, include_roles, start_y, config, text_styling)[0], config)
+        for section, start_y in zip(sections, start_ys)
     )
-        
-    return document
+
+def render_svg_parallel(
+    content: Content,
+    config: LayoutConfig,
+    text_styling: FullStyling,
+    workers: int | None = None,
+    executor: Executor | None = None,
+    min_names: int = PARALLEL_MIN_NAMES,
+) -> str:
+    """renders the same markup as render_svg_string, laying out and emitting sections across processes;
+    each section's starting y is computed arithmetically first so the sections are independent.
+    Falls back to a serial render for small documents.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers < 2 or len(content.names) < 2 or sum(len(section) for section in content.names) < min_names:
+        return render_svg_string(content, config, text_styling)
+
+    with timed("layout"):
+        start_ys, layout = plan_document(content, config, text_styling)
+
+    # * Split sections into a few chunks per worker of roughly equal name count
+    chunk_target = sum(len(section) for section in content.names) / (workers * 4)
+    chunks: List[Tuple[int, int]] = []
+    start = size = 0
+    for i, section in enumerate(content.names):
+        size += len(section)
+        if size >= chunk_target:
+            chunks.append((start, i + 1))
+            start, size = i + 1, 0
+    if start < len(content.names):
+        chunks.append((start, len(content.names)))
+
+    with timed("serialize"):
+        own_executor = executor is None
+        pool = executor if executor is not None else ProcessPoolExecutor(max_workers=workers)
+        try:
+            fragments = pool.map(
+                _render_sections,
+                [content.names[a:b] for a, b in chunks],
+                [start_ys[a:b] for a, b in chunks],
+                [content.include_roles] * len(chunks),
+                [config] * len(chunks),
+                [text_styling] * len(chunks),
+            )
+            return emit_header(layout, text_styling) + "".join(fragments) + emit_footer(layout)
+        finally:
+            if own_executor:
+                pool.shutdown()
+
+
+
+# * Pagination
+
+@dataclass
+class PagePlan:
+    # (section index, first name, end name, whether the label is drawn); names index section[1:]
+    pieces: List[Tuple[int, int, int, bool]]
+    include_subtitles: bool
+
+def plan_pages(content: Content, config: LayoutConfig, text_styling: FullStyling, max_height: int, repeat_labels: bool = False) -> Iterator[PagePlan]:
+    """splits the document into pages no taller than max_height, lazily and without laying out any names.
+    Pages break between rows, so a name always stays with its role and a section's centered last row stays last;
+    a label is never left at the bottom of a page without at least one row under it.
+    A single row that can't fit on an empty page gets a page of its own, taller than max_height.
+    """
+    strategy = get_layout(config.layout_strategy)
+    include_roles = content.include_roles
+    jump = config.name_to_name_jump(include_roles)
+    role_gap = config.name_to_role if include_roles else 0
+    # what render_svg adds below the last section: the section gap and bottom margin
+    trailer = config.section_to_section + 50
+
+    pieces: List[Tuple[int, int, int, bool]] = []
+    current_y = config.initial_y
+    for index, section in enumerate(content.names):
+        name_count = len(section) - 1
+        start = 0
+        label = True
+        while True:
+            rest = section[1 + start:]
+            remaining_rows = strategy.row_count(rest, include_roles, config, text_styling)
+            head = config.label_to_names if label else 0
+            room = max_height - trailer - role_gap - head - current_y
+            if room < 0:
+                if pieces:
+                    yield PagePlan(pieces, False)
+                    pieces = []
+                    current_y = config.initial_y
+                    continue
+                fitting = 1
+            else:
+                # the first row costs nothing beyond the head, each further one a jump
+                fitting = room // jump + 1 if jump > 0 else remaining_rows
+            if fitting >= remaining_rows:
+                pieces.append((index, start, name_count, label))
+                current_y = section_end_y(remaining_rows, include_roles, current_y, config, label) + config.section_to_section
+                break
+            # at least one name, so a strategy that can't fit any still makes progress
+            stop = start + max(strategy.prefix_for_rows(rest, fitting, include_roles, config, text_styling), 1)
+            pieces.append((index, start, stop, label))
+            yield PagePlan(pieces, False)
+            pieces = []
+            current_y = config.initial_y
+            start = stop
+            label = repeat_labels
+
+    # * Subtitles go on the last page if they fit, otherwise on one of their own
+    if content.subtitles:
+        _, subtitles_end = layout_subtitles(content.subtitles, current_y, config)
+        if pieces and subtitles_end + 50 > max_height:
+            yield PagePlan(pieces, False)
+            pieces = []
+    yield PagePlan(pieces, bool(content.subtitles))
+
+def layout_page(plan: PagePlan, content: Content, config: LayoutConfig, text_styling: FullStyling) -> DocumentLayout:
+    current_y = config.initial_y
+    sections = []
+    for index, start, stop, label in plan.pieces:
+        section = content.names[index]
+        section_layout, current_y = layout_section([section[0], *section[1 + start:1 + stop]], content.include_roles, current_y, config, text_styling, label)
+        sections.append(section_layout)
+        current_y += config.section_to_section
+    subtitles, current_y = layout_subtitles(content.subtitles if plan.include_subtitles else [], current_y, config)
+    return DocumentLayout(config.canvas_width(), current_y + 50, sections, subtitles)
+
+def paginate_svg(
+    content: Content,
+    config: LayoutConfig,
+    text_styling: FullStyling,
+    max_height: int,
+    repeat_labels: bool = False,
+    outline_text: bool = False,
+    dedup_threshold: int = 0,
+) -> Iterator[str]:
+    """yields one SVG document per page, laying out each page only when it is requested;
+    outline_text and dedup_threshold work as in render_svg_string
+    """
+    if outline_text:
+        from outlines import emit_outlined_svg
+    for plan in plan_pages(content, config, text_styling, max_height, repeat_labels):
+        with timed("layout"):
+            layout = layout_page(plan, content, config, text_styling)
+        with timed("serialize"):
+            if outline_text:
+                page = emit_outlined_svg(layout, config, text_styling)
+            else:
+                page = emit_svg(layout, config, text_styling, dedup_threshold)
+        yield page
+
+
+
+# * Async entry points
+
+def _start_qt_before_executor(config: LayoutConfig):
+    """a strategy that measures text starts Qt on first use, and a Qt application can only be started on the main thread,
+    so it's started here rather than in an executor's thread
+    """
+    if get_layout(config.layout_strategy).measures_text:
+        from export import ensure_gui_application
+        ensure_gui_application()
+
+def iter_svg(content: Content, config: LayoutConfig, text_styling: FullStyling) -> Iterator[str]:
+    """yields the same markup as render_svg_string a section at a time, laying each out only when it's reached,
+    so the layout of at most one section is held in memory
+    """
+    start_ys, layout = plan_document(content, config, text_styling)
+    yield emit_header(layout, text_styling)
+    for section, start_y in zip(content.names, start_ys):
+        yield emit_section(layout_section(section, content.include_roles, start_y, config, text_styling)[0], config)
+    yield emit_footer(layout)
+
+async def process_names_async(names_str: str, executor: Executor | None = None) -> Content:
+    """process_names run in executor (the event loop's default thread pool if None)
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor, process_names, names_str)
+
+async def render_svg_async(content: Content, config: LayoutConfig, text_styling: FullStyling, executor: Executor | None = None) -> str:
+    """render_svg_string run in executor (the event loop's default thread pool if None);
+    pass a ProcessPoolExecutor to keep big layouts off the event loop's thread entirely
+    """
+    _start_qt_before_executor(config)
+    return await asyncio.get_running_loop().run_in_executor(executor, render_svg_string, content, config, text_styling)
+
+async def write_svg_async(
+    writer: asyncio.StreamWriter,
+    content: Content,
+    config: LayoutConfig,
+    text_styling: FullStyling,
+    executor: Executor | None = None,
+    lookahead: int = 4,
+):
+    """streams the same markup as render_svg_string to writer, one section at a time;
+    the document is planned and up to lookahead sections are laid out in executor ahead of the one being written
+    """
+    loop = asyncio.get_running_loop()
+    _start_qt_before_executor(config)
+    # planning counts every section's rows, which for measuring strategies like packed is as slow as laying them out
+    start_ys, layout = await loop.run_in_executor(executor, plan_document, content, config, text_styling)
+
+    writer.write(emit_header(layout, text_styling).encode())
+    pending: Deque[asyncio.Future] = deque()
+    for section, start_y in zip(content.names, start_ys):
+        pending.append(loop.run_in_executor(executor, _render_sections, [section], [start_y], content.include_roles, config, text_styling))
+        if len(pending) > lookahead:
+            writer.write((await pending.popleft()).encode())
+            await writer.drain()
+    while pending:
+        writer.write((await pending.popleft()).encode())
+        await writer.drain()
+    writer.write(emit_footer(layout).encode())
+    await writer.drain()
 
 
 
 if __name__ == "__main__":
-    with open("names.txt", "r") as f:
-        file_content = f.read()
-    
-    try:
-        input_content = process_names(file_content)
-    except ValueError as e:
-        sys.exit(e.args[0])
-    
-    layout_config = LayoutConfig()
+    parser = argparse.ArgumentParser(description="Render a names file to SVG.")
+    parser.add_argument("input", nargs="?", default="names.txt")
+    parser.add_argument("output", nargs="?", default="names.svg")
+    parser.add_argument("--layout", choices=list(LAYOUT_STRATEGIES), default="grid", help="how names are arranged in each section")
+    parser.add_argument("--sort", action="append", choices=list(SORT_FIELDS), metavar="FIELD", help=f"sort names within sections by FIELD ({', '.join(SORT_FIELDS)}); repeat for tie-breakers")
+    parser.add_argument("--locale", default="", help="with --sort, collate names in this locale, e.g. sv_SE.UTF-8 (the environment's locale by default)")
+    parser.add_argument("--split", type=int, default=0, metavar="N", help="with --sort, split sections of more than N names alphabetically")
+    parser.add_argument("--slow", action="store_true", help="build and serialize an svg.py tree instead of using the string templates")
+    parser.add_argument("--workers", type=int, default=1, help="render sections across this many processes (0 for one per core)")
+    parser.add_argument("--outline-text", action="store_true", help="draw text as embedded glyph outlines so it doesn't depend on installed fonts")
+    parser.add_argument("--dedup", type=int, default=0, metavar="N", help="define strings repeated at least N times once and reference them with <use>")
+    parser.add_argument("--max-height", type=int, help="split the output into pages no taller than this, written as OUTPUT-1.svg, OUTPUT-2.svg, ...")
+    parser.add_argument("--repeat-labels", action="store_true", help="repeat a section's label on pages it continues onto")
+    parser.add_argument("--png", action="store_true", help="also write a PNG proof next to each SVG")
+    parser.add_argument("--pdf", action="store_true", help="also write a PDF proof next to each SVG")
+    parser.add_argument("--dpi", type=int, default=300, help="resolution of PNG proofs")
+    parser.add_argument("--stats", metavar="PATH", help="write render timings as JSON to PATH")
+    parser.add_argument("--profile", metavar="PATH", help="capture a cProfile of the render to PATH")
+    args = parser.parse_args()
+    if args.max_height and (args.slow or args.workers != 1):
+        parser.error("--max-height can't be combined with --slow or --workers")
+    if args.sort:
+        try:
+            set_collation_locale(args.locale)
+        except ValueError as e:
+            parser.error(e.args[0])
+
+    stem, extension = os.path.splitext(args.output)
+    # the plain render is written as it's produced instead of being built up in memory first
+    stream = not (args.max_height or args.slow or args.outline_text or args.dedup or args.png or args.pdf) and args.workers == 1
+
+    # (stem, svg text) of every document written, kept only when proofs are made from them
+    documents: List[Tuple[str, str]] = []
+
+    with profiled(args.profile) as profiler:
+        try:
+            # names are read from the mapped file as they're laid out
+            input_content = map_names(args.input)
+        except ValueError as e:
+            sys.exit(e.args[0])
+        if args.sort:
+            with timed("sort"):
+                input_content = sort_content(input_content, args.sort, split=args.split)
+
+        layout_config = LayoutConfig(layout_strategy=args.layout)
+
+        styles = FullStyling.with_color("#FFFFFF")
+
+        with timed("render"):
+            if stream:
+                with open(args.output, "w") as f:
+                    f.writelines(iter_svg(input_content, layout_config, styles))
+                svg_text = ""
+            elif args.max_height:
+                svg_text = ""
+                # each page is written as soon as it's rendered, so only one is held at a time unless proofs need them all
+                pages = paginate_svg(input_content, layout_config, styles, args.max_height, args.repeat_labels, args.outline_text, args.dedup)
+                for page_number, page in enumerate(pages, start=1):
+                    with open(f"{stem}-{page_number}{extension}", "w") as f:
+                        f.write(page)
+                    if args.png or args.pdf:
+                        documents.append((f"{stem}-{page_number}", page))
+            elif args.workers != 1 and not args.slow:
+                svg_text = render_svg_parallel(input_content, layout_config, styles, workers=args.workers or None)
+            else:
+                svg_text = render_svg_string(input_content, layout_config, styles, fast=not args.slow, outline_text=args.outline_text, dedup_threshold=args.dedup)
+
+    # * Write the SVG (pages and streamed output are already written) and any raster/PDF proofs of it
+    if not (stream or args.max_height):
+        with open(args.output, "w") as f:
+            f.write(svg_text)
+        documents.append((stem, svg_text))
 
-    styles = FullStyling.with_color("#FFFFFF")
+    if args.png or args.pdf:
+        from export import export_many
+        for format in [format for format, wanted in (("png", args.png), ("pdf", args.pdf)) if wanted]:
+            export_many([(document_text, f"{document_stem}.{format}") for document_stem, document_text in documents], format, args.dpi)
 
-    document = render_svg(input_content, layout_config, styles)
-    with open("names.svg", "w") as f:
-        f.write(str(document))
+    if profiler:
+        print(profile_report(profiler), file=sys.stderr)
+    if args.stats:
+        render_stats.dump(args.stats)
     
\ No newline at end of file
@@ -1,5 +1,9 @@
+from contextlib import contextmanager
+from functools import partial
+import html
 import sys
-from typing import Dict
+import time
+from typing import Callable, Dict, List, Tuple
 
 from PySide6.QtWidgets import (
     QApplication,
@@ -13,6 +17,7 @@ from PySide6.QtWidgets import (
     QDialog,
     QTreeWidget,
     QTreeWidgetItem,
+    QTreeView,
     QPushButton,
     QFileDialog,
     QFontComboBox,
@@ -20,9 +25,11 @@ from PySide6.QtWidgets import (
     QComboBox,
     QMessageBox,
     QSizePolicy,
+    QTableWidget,
+    QTableWidgetItem,
 )
 from PySide6.QtSvg import QSvgRenderer
-from PySide6.QtCore import Qt, QTimer, QSize, QXmlStreamReader
+from PySide6.QtCore import Qt, QTimer, QRectF, QSize, QXmlStreamReader, QAbstractItemModel, QModelIndex, QThread, Signal
 from PySide6.QtGui import QCloseEvent, QPainter, QFont, QColor, QAction, QKeySequence
 
 
@@ -33,47 +40,243 @@ from data import (
     TextStyling,
     process_names,
 )
-from gen import render_svg
+from diagnostics import Diagnostics
+from export import export_pdf, export_png
+from gen import DocumentLayout, emit_svg, layout_document
+from history import History, HistoryEntry
+from instrument import profile_report, profiled, render_stats, timed
+from layouts import LAYOUT_STRATEGIES
+from project import ProjectReader, fingerprint, save_project
+from sorting import NameSorter, set_collation_locale, sort_content
 
 content = Content([], [], False)
 styling = FullStyling()
 layout_config = LayoutConfig()
 svg_content = ""
+# svg_content around its stylesheet, so a style-only change doesn't regenerate the body
+svg_before_style = ""
+svg_after_style = ""
 svg_widget = None
+names_model = None
 changes_since_render = False
+# only the stylesheet changed (e.g. a fill), so the rendered body can be kept
+style_changes_since_render = False
 changes_since_save = False
-
-rerender_count = 0
+# while a project's names stream in, renders wait so the empty content isn't drawn over its cached preview
+loading_project = False
+
+# change notifications folded into the next render (render_stats keeps a histogram); one per user action when bulk edits are batched
+changes_since_last_render = 0
+# nesting depth of batch_update() blocks and whether anything changed inside them
+batch_depth = 0
+changes_in_batch = False
+style_changes_in_batch = False
+# called once per change notification (i.e. once per batch)
+change_listeners: List[Callable[[], None]] = []
+# when set, the next render runs under cProfile and is written to this path
+profile_next_render: str | None = None
+# undo/redo steps, recorded once per change notification
+history: History | None = None
+# while a history entry is being put back, the change notifications it causes aren't recorded as new steps
+restoring_history = False
+# resource tracking (Debug > Track Resources), sampled after every render and restyle
+diagnostics: Diagnostics | None = None
+
+# * Level of detail: while changes keep coming faster than a full render can be shown, names are drawn as bars
+
+# a full render (render, load and paint) slower than this is replaced by bars during continuous changes
+PREVIEW_BUDGET_MS = 1000 / 24
+# how long input has to pause before the full render is drawn
+PREVIEW_SETTLE_MS = 150
+# when the last change notification came (time.perf_counter())
+last_change_time = 0.0
+changes_since_preview = False
+# how long the last full render took to lay out, emit and load; SvgWidget.paint_ms has its paint
+full_render_ms = 0.0
+# the same for the last stylesheet swap (reloading the document), and whether the bars lag behind the styling
+restyle_ms = 0.0
+style_changes_since_preview = False
 
 # TODO: Only rerender if changes?
-def update_svg():
+def update_svg(force: bool = False):
+    """renders pending changes; while changes keep coming and renders are slow, shows bars instead unless forced
+    """
     global svg_content
     global svg_widget
-    global rerender_count
     global changes_since_render
+    global style_changes_since_render
+    global changes_since_last_render
+    global profile_next_render
+    global changes_since_preview
+    global full_render_ms
+
+    if changes_since_render and not loading_project:
+        shown_ms = full_render_ms + (svg_widget.paint_ms if svg_widget else 0)
+        # the settle time runs from whichever came last: the change, or drawing its bars (so slow previews don't count as a pause)
+        last_activity = max(last_change_time, svg_widget.preview_painted if svg_widget else 0.0)
+        if not force and shown_ms > PREVIEW_BUDGET_MS and (time.perf_counter() - last_activity) * 1000 < PREVIEW_SETTLE_MS:
+            # still changing: show bars from the layout alone and wait for input to settle
+            if changes_since_preview and svg_widget:
+                with timed("preview"):
+                    svg_widget.show_preview(layout_document(content, layout_config, styling))
+                render_stats.increment("previews")
+                changes_since_preview = False
+            return
 
-    if changes_since_render:
-        svg_document = render_svg(content, layout_config, styling)
-        svg_content = str(svg_document)
-        rerender_count += 1
-        print(f"Rerendered {rerender_count}")
-        if svg_widget:
-            svg_widget.update_content(QXmlStreamReader(svg_content))
-            svg_widget.update()
+        start = time.perf_counter()
+        with profiled(profile_next_render) as profiler:
+            with timed("render"):
+                with timed("layout"):
+                    layout = layout_document(content, layout_config, styling)
+                with timed("serialize"):
+                    svg_content = emit_svg(layout, layout_config, styling)
+        if profiler:
+            print(profile_report(profiler))
+            print(f"Profile written to {profile_next_render}")
+            profile_next_render = None
+        render_stats.increment("renders")
+        render_stats.observe("changes_per_render", changes_since_last_render)
+        show_svg(svg_content, layout)
+        if history:
+            history.attach_render(svg_content, layout)
         changes_since_render = False
+        style_changes_since_render = False
+        changes_since_preview = False
+        changes_since_last_render = 0
+        full_render_ms = (time.perf_counter() - start) * 1000
+        if diagnostics:
+            diagnostics.sample("render")
+
+def update_svg_style(force: bool = False):
+    """swaps the stylesheet of the shown document for the current styling, without laying out or emitting names;
+    run from a timer at the display's refresh rate. While colors keep changing and the swap can't keep up,
+    the shown layout is drawn as bars in the new colors instead, and the swap waits for input to settle (unless forced)
+    """
+    global style_changes_since_render
+    global style_changes_since_preview
+    global restyle_ms
+
+    if style_changes_since_render and not changes_since_render and not loading_project:
+        shown_ms = restyle_ms + (svg_widget.paint_ms if svg_widget else 0)
+        last_activity = max(last_change_time, svg_widget.preview_painted if svg_widget else 0.0)
+        if (not force and svg_widget and svg_widget.shown_layout is not None and shown_ms > PREVIEW_BUDGET_MS
+                and (time.perf_counter() - last_activity) * 1000 < PREVIEW_SETTLE_MS):
+            # paint_bars reads the fills when it paints
+            if style_changes_since_preview:
+                with timed("preview"):
+                    svg_widget.show_preview(svg_widget.shown_layout)
+                render_stats.increment("previews")
+                style_changes_since_preview = False
+            return
+
+        start = time.perf_counter()
+        with timed("restyle"):
+            show_svg(svg_before_style + str(styling) + svg_after_style, svg_widget.shown_layout if svg_widget else None)
+        if history:
+            history.attach_render(svg_content, svg_widget.shown_layout if svg_widget else None)
+        render_stats.increment("restyles")
+        style_changes_since_render = False
+        style_changes_since_preview = False
+        restyle_ms = (time.perf_counter() - start) * 1000
+        if diagnostics:
+            diagnostics.sample("restyle")
+
+def render_now():
+    """brings svg_content up to date with every pending change, for saving and exporting:
+    a full render rather than bars, with any stylesheet-only changes applied
+    """
+    update_svg(force=True)
+    update_svg_style(force=True)
+
+def show_svg(new_svg_content: str, layout: DocumentLayout | None = None):
+    """displays an already rendered document; its layout, if given, is used for cheap redraws while resizing
+    """
+    global svg_content
+    global svg_before_style
+    global svg_after_style
+    svg_content = new_svg_content
+    # emit_header writes the stylesheet as the first <style> element
+    style_start = svg_content.find("<style>")
+    style_end = svg_content.find("</style>", style_start)
+    if style_start != -1 and style_end != -1:
+        svg_before_style = svg_content[:style_start + len("<style>")]
+        svg_after_style = svg_content[style_end:]
+    else:
+        svg_before_style = svg_after_style = ""
+    if svg_widget:
+        svg_widget.update_content(QXmlStreamReader(svg_content), layout)
+        svg_widget.update()
 
 def mark_changes():
     global changes_since_render
     global changes_since_save
+    global changes_since_last_render
+    global changes_in_batch
+    global changes_since_preview
+    global last_change_time
+
+    if batch_depth > 0:
+        changes_in_batch = True
+        return
+
     changes_since_render = True
     changes_since_save = True
+    changes_since_preview = True
+    last_change_time = time.perf_counter()
+    changes_since_last_render += 1
+    render_stats.increment("change_notifications")
+    for listener in change_listeners:
+        listener()
+
+def mark_style_changes():
+    """like mark_changes, for changes that only affect the stylesheet (fills);
+    these are previewed by update_svg_style without a full render
+    """
+    global changes_since_render
+    global style_changes_since_render
+    global changes_since_save
+    global style_changes_in_batch
+    global style_changes_since_preview
+    global last_change_time
 
-# def perform_batch_update(update_function):
-#     global batch_update_lock
-#     batch_update_lock = True
-#     update_function()
-#     batch_update_lock = False
-#     #update_svg()
+    if batch_depth > 0:
+        style_changes_in_batch = True
+        return
+
+    if not svg_before_style:
+        # nothing to restyle yet (or a document without a stylesheet)
+        mark_changes()
+        return
+
+    style_changes_since_render = True
+    style_changes_since_preview = True
+    changes_since_save = True
+    last_change_time = time.perf_counter()
+    render_stats.increment("style_notifications")
+    for listener in change_listeners:
+        listener()
+
+@contextmanager
+def batch_update():
+    """groups every mark_changes() made inside the block
+    into a single change notification when the outermost block exits
+    """
+    global batch_depth
+    global changes_in_batch
+    global style_changes_in_batch
+
+    batch_depth += 1
+    try:
+        yield
+    finally:
+        batch_depth -= 1
+        if batch_depth == 0 and changes_in_batch:
+            changes_in_batch = False
+            style_changes_in_batch = False
+            mark_changes()
+        elif batch_depth == 0 and style_changes_in_batch:
+            style_changes_in_batch = False
+            mark_style_changes()
 
 class SpacingEntry(QWidget):
     def __init__(self, setting: str, value: int, parent = None):
@@ -86,7 +289,7 @@ class SpacingEntry(QWidget):
 
         self.value_edit = QSpinBox(self)
 
-        self.value_edit.setMinimum(-1000)
+        self.value_edit.setMinimum(1 if setting == "columns" else -1000)
         self.value_edit.setMaximum(1000)
         self.value_edit.setValue(value)
 
@@ -116,7 +319,16 @@ class SpacingSettings(QWidget):
 
         layout = QVBoxLayout()
         layout.setSpacing(0)
+
+        self.layout_strategy_edit = LabelledComboBox("Layout:", list(LAYOUT_STRATEGIES), self)
+        self.layout_strategy_edit.combo_box.setCurrentText(layout_config.layout_strategy)
+        self.layout_strategy_edit.combo_box.currentTextChanged.connect(self.layout_strategy_updated)
+        layout.addWidget(self.layout_strategy_edit)
+
         for setting, value in self.settings.items():
+            # the strategy is picked above; everything else is a spacing
+            if not isinstance(value, int):
+                continue
             entry = SpacingEntry(setting, value, self)
             self.spacing_entries[setting] = entry
             layout.addWidget(entry)
@@ -127,51 +339,29 @@ class SpacingSettings(QWidget):
         layout.addStretch()
         self.setLayout(layout)
 
+    def refresh(self):
+        """shows the values currently in the global layout config
+        """
+        with batch_update():
+            self.layout_strategy_edit.combo_box.setCurrentText(layout_config.layout_strategy)
+            for setting, entry in self.spacing_entries.items():
+                entry.value_edit.setValue(layout_config.get_value(setting))
+
     def reset_to_defaults(self):
         defaults = layout_config.get_all_defaults()
-        for setting,entry in self.spacing_entries.items():
-            default = defaults[setting]
-            layout_config.set_value(setting, default)
-            entry.value_edit.setValue(default)
+        with batch_update():
+            layout_config.set_value("layout_strategy", defaults["layout_strategy"])
+            self.layout_strategy_edit.combo_box.setCurrentText(defaults["layout_strategy"])
+            for setting,entry in self.spacing_entries.items():
+                default = defaults[setting]
+                layout_config.set_value(setting, default)
+                entry.value_edit.setValue(default)
+            mark_changes()
+
+    def layout_strategy_updated(self, new_value: str):
+        layout_config.set_value("layout_strategy", new_value)
         mark_changes()
 
-# # \TODO: Wire-up
-# class ParticipantEntry(QWidget):
-#     """a widget representing one participant entry with name and role
-#     """
-#     def __init__(self, name = "", role = "", parent = None, roles_enabled = True):
-#         super().__init__(parent)
-#         layout = QHBoxLayout()
-#         self.name_edit = QLineEdit(name)
-#         self.role_edit = QLineEdit(role)
-#         self.role_edit.setDisabled(not roles_enabled)
-#         layout.addWidget(self.name_edit)
-#         layout.addWidget(self.role_edit)
-#         self.setLayout(layout)
-
-# # \TODO: Wire-up
-# class SectionEntry(QWidget):
-#     """a widget representing a section of participant entries
-#     """
-#     def __init__(self, title = "", parent = None, roles_enabled = True):
-#         super().__init__(parent)
-        
-#         layout = QVBoxLayout()
-        
-#         self.title_label = QLineEdit(title)
-#         layout.addWidget(self.title_label)
-        
-#         self.participant_entries = []
-#         self.roles_enabled = roles_enabled
-#         self.setLayout(layout)
-
-#     def add_participant(self, name = "", role = ""):
-#         """adds a participant entry to this section
-#         """
-#         entry = ParticipantEntry(name, role, self, self.roles_enabled)
-#         self.participant_entries.append(entry)
-#         self.layout().addWidget(entry) # type: ignore
-
 # class FileSelector(QWidget):
 #     def __init__(self, name, parent = None, save = False, svg=False, txt=False):
 #         super().__init__(parent)
@@ -275,6 +465,30 @@ class SpacingSettings(QWidget):
 #                 print(e.args[0])
 #             #update_svg()
 
+class ProjectLoader(QThread):
+    """reads a project's names off the GUI thread
+    """
+    # the loaded Content, and whether it matches the project's cached render
+    loaded = Signal(object, bool)
+    # why the names couldn't be read
+    failed = Signal(str)
+
+    def __init__(self, reader: ProjectReader, parent = None):
+        super().__init__(parent)
+        self.reader = reader
+
+    def run(self):
+        try:
+            with self.reader:
+                loaded_content = self.reader.load_content()
+                cache = self.reader.cache
+                matches = cache is not None and cache["fingerprint"] == fingerprint(loaded_content, self.reader.config, self.reader.styling)
+        except Exception as e:
+            # e.g. a truncated or damaged section line; without a signal the GUI would wait for the names forever
+            self.failed.emit(f"The names in the project couldn't be read: {e}")
+            return
+        self.loaded.emit(loaded_content, matches)
+
 class FileMenu():
     """a menu to handle file operations
     """
@@ -297,12 +511,34 @@ class FileMenu():
         open_names_action.triggered.connect(self.open_names_file)
         file_menu.addAction(open_names_action)
 
-    def get_file_selection(self, save: bool = False, svg = False, txt = False):
+        open_project_action = QAction("Open &Project", main)
+        open_project_action.triggered.connect(self.open_project)
+        file_menu.addAction(open_project_action)
+
+        save_project_action = QAction("Save Pro&ject", main)
+        save_project_action.triggered.connect(self.save_project)
+        file_menu.addAction(save_project_action)
+
+        export_png_action = QAction("Export P&NG Proof", main)
+        export_png_action.triggered.connect(self.export_png)
+        file_menu.addAction(export_png_action)
+
+        export_pdf_action = QAction("Export P&DF Proof", main)
+        export_pdf_action.triggered.connect(self.export_pdf)
+        file_menu.addAction(export_pdf_action)
+
+    def get_file_selection(self, save: bool = False, svg = False, txt = False, png = False, pdf = False, project = False):
         self.filetypes = []
         if svg:
             self.filetypes.append("SVG Files (*.svg)")
         if txt:
             self.filetypes.append("Text Files (*.txt)")
+        if png:
+            self.filetypes.append("PNG Images (*.png)")
+        if pdf:
+            self.filetypes.append("PDF Files (*.pdf)")
+        if project:
+            self.filetypes.append("Project Files (*.nsproj)")
         if not self.filetypes:  
             self.filetypes.append("All Files (*.*)")
         self.filetypes_str = ";;".join(self.filetypes)
@@ -325,6 +561,7 @@ class FileMenu():
         return file_name
 
     def export_svg(self, destination):
+            render_now()
             with open(destination, "w") as f:
                 f.write(svg_content)
             global changes_since_save
@@ -341,19 +578,214 @@ class FileMenu():
         if self.save_destination:
             self.export_svg(self.save_destination)
 
+    def save_project(self):
+        if loading_project:
+            print("The project is still loading.")
+            return
+        destination = self.get_file_selection(save=True, project=True)
+        if destination:
+            render_now()
+            save_project(destination, content, layout_config, styling, svg_content)
+            global changes_since_save
+            changes_since_save = False
+
+    def open_project(self):
+        global content
+        global loading_project
+        global changes_since_render
+        global changes_since_save
+
+        selected_file = self.get_file_selection(project=True)
+        if not selected_file or loading_project:
+            return
+        try:
+            reader = ProjectReader(selected_file)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self.main, "Open Project", str(e))
+            return
+
+        # what to go back to if the names can't be read
+        self.before_project = (content, layout_config.freeze(), styling.freeze(), changes_since_save)
+        loading_project = True
+
+        # * Apply settings and show the cached render right away
+        with batch_update():
+            for setting, value in reader.config.get_all_keys_and_values().items():
+                layout_config.set_value(setting, value)
+            styling.update_from_other(reader.styling)
+            self.main.spacing_settings.refresh()
+            self.main.style_settings.refresh()
+        content = Content([], reader.subtitles, reader.include_roles)
+        if names_model:
+            names_model.reload()
+        cached = reader.cached_svg()
+        if cached is not None:
+            show_svg(cached)
+            changes_since_render = False
+        changes_since_save = False
+
+        # * Stream the names in the background
+        self.loader = ProjectLoader(reader, parent=self.main)
+        self.loader.loaded.connect(self.project_loaded)
+        self.loader.failed.connect(self.project_failed)
+        self.loader.start()
+
+    def project_loaded(self, loaded_content: Content, matches_cache: bool):
+        global content
+        global loading_project
+        content = loaded_content
+        loading_project = False
+        self.main.edit_menu.reset()
+        if names_model:
+            names_model.reload()
+        if not matches_cache:
+            mark_changes()
+
+    def project_failed(self, message: str):
+        """puts back the names and settings from before the project was opened
+        """
+        global content
+        global loading_project
+        global changes_since_save
+        previous_content, previous_config, previous_styling, changes_since_save = self.before_project
+        loading_project = False
+        with batch_update():
+            content = previous_content
+            for setting, value in previous_config.get_all_keys_and_values().items():
+                layout_config.set_value(setting, value)
+            styling.update_from_other(previous_styling)
+            self.main.spacing_settings.refresh()
+            self.main.style_settings.refresh()
+            if names_model:
+                names_model.reload()
+            mark_changes()
+        QMessageBox.warning(self.main, "Open Project", message)
+
+    def export_png(self):
+        render_now()
+        destination = self.get_file_selection(save=True, png=True)
+        if destination:
+            export_png(svg_content, destination)
+
+    def export_pdf(self):
+        render_now()
+        destination = self.get_file_selection(save=True, pdf=True)
+        if destination:
+            export_pdf(svg_content, destination)
+
     def open_names_file(self):
         selected_file = self.get_file_selection(txt=True)
         if selected_file:
+            # read into memory rather than mapped: the file can change or be deleted while the names are still
+            # being edited (and kept in undo snapshots), which a mapping turns into a crash or, on Windows, a locked file
             with open(selected_file, "r") as f:
                 file_content = f.read()
                 try:
                     global content
                     tmp_content = process_names(file_content)
                     content = tmp_content
+                    self.main.edit_menu.reset()
                 except ValueError as e:
                     print(e.args[0])
+            if names_model:
+                names_model.reload()
         mark_changes()
 
+class EditMenu():
+    """undo and redo through the global history
+    """
+    def __init__(self, main: QMainWindow, edit_menu):
+        self.main = main
+
+        self.undo_action = QAction("&Undo", main)
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        edit_menu.addAction(self.undo_action)
+
+        self.redo_action = QAction("&Redo", main)
+        self.redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self.redo_action.triggered.connect(self.redo)
+        edit_menu.addAction(self.redo_action)
+
+        edit_menu.addSeparator()
+        sort_menu = edit_menu.addMenu("&Sort Names")
+        for label, fields in (("By &Last Name", ["last", "first"]), ("By &First Name", ["first"]), ("By &Role", ["role", "last"])):
+            action = QAction(label, main)
+            action.triggered.connect(partial(self.sort_names, fields))
+            sort_menu.addAction(action)
+        # (fields, include_roles) -> sorter, kept so sorting again only computes keys for names that changed
+        self.sorters: Dict[Tuple[Tuple[str, ...], bool], NameSorter] = {}
+
+        self.update_actions()
+
+    def record(self):
+        """change listener: adds the current state to the history
+        """
+        # while a project loads, its settings and names arrive separately; reset() starts the history once both are in
+        if history and not restoring_history and not loading_project:
+            history.record(content, layout_config, styling)
+            self.update_actions()
+
+    def reset(self):
+        """starts a new history at the current document, so undo never mixes in names or settings from another file
+        """
+        global history
+        history = History(content, layout_config, styling)
+        self.update_actions()
+
+    def sort_names(self, fields: List[str]):
+        """sorts the names of every section; undoable like any other edit
+        """
+        key = (tuple(fields), content.include_roles)
+        sorter = self.sorters.get(key)
+        if sorter is None:
+            sorter = self.sorters[key] = NameSorter(fields, content.include_roles)
+        with batch_update():
+            content.names = sort_content(content, fields, sorter=sorter).names
+            if names_model:
+                names_model.reload()
+            mark_changes()
+
+    def update_actions(self):
+        self.undo_action.setEnabled(bool(history and history.can_undo()))
+        self.redo_action.setEnabled(bool(history and history.can_redo()))
+
+    def undo(self):
+        if history and history.can_undo():
+            self.restore(history.undo())
+
+    def redo(self):
+        if history and history.can_redo():
+            self.restore(history.redo())
+
+    def restore(self, entry: HistoryEntry):
+        """puts the entry's state back into the global models in place and shows its render if it still has one
+        """
+        global restoring_history
+        global changes_since_render
+        global style_changes_since_render
+        global changes_since_preview
+
+        restoring_history = True
+        try:
+            with batch_update():
+                history.restore(entry, content, layout_config, styling)
+                self.main.spacing_settings.refresh()
+                self.main.style_settings.refresh()
+                if names_model:
+                    names_model.reload()
+                mark_changes()
+        finally:
+            restoring_history = False
+
+        if entry.svg_text is not None:
+            show_svg(entry.svg_text, entry.layout)
+            changes_since_render = False
+            style_changes_since_render = False
+            changes_since_preview = False
+            render_stats.increment("history_render_hits")
+        self.update_actions()
+
 class LabelledComboBox(QWidget):
     """a widget representing one labelled combo box
     """
@@ -431,15 +863,14 @@ class TextStyleEntry(QWidget):
 
         self.set_values()
 
-        #perform_batch_update(self.set_values)
-
     def set_values(self):
-        self.font_family_edit.setCurrentFont(QFont(self.style_model.font_family))
-        self.font_size_edit.setValue(int(self.style_model.font_size.replace("px", "")))
-        self.font_weight_edit.combo_box.setCurrentText(self.style_model.font_weight.capitalize())
-        self.font_style_edit.combo_box.setCurrentText(self.style_model.font_style.capitalize())
-        self.color_button.color_button.setCurrentColor(QColor(self.style_model.fill))
-        mark_changes()
+        with batch_update():
+            self.font_family_edit.setCurrentFont(QFont(self.style_model.font_family))
+            self.font_size_edit.setValue(int(self.style_model.font_size.replace("px", "")))
+            self.font_weight_edit.combo_box.setCurrentText(self.style_model.font_weight.capitalize())
+            self.font_style_edit.combo_box.setCurrentText(self.style_model.font_style.capitalize())
+            self.color_button.color_button.setCurrentColor(QColor(self.style_model.fill))
+            mark_changes()
 
     def font_updated(self, font: QFont):
         self.style_model.font_family = font.family()
@@ -463,8 +894,7 @@ class TextStyleEntry(QWidget):
 
     def color_updated(self, color: QColor):
         self.style_model.fill = color.name()
-        #update_svg()
-        mark_changes()
+        mark_style_changes()
 
 class SectionExpandButton(QPushButton):
     """a QPushbutton that can expand or collapse its section
@@ -574,110 +1004,221 @@ class CollapsibleStyleDialog(CollapsibleDialog):
             self.sections.append((f"{kind} Styles", text_style_entry))
             self.text_style_entries[kind] = (text_style_entry)
 
-        # TODO: Live update as user is choosing a color without hanging the program
-        self.controls.set_color_for_all_button.color_button.colorSelected.connect(self.set_color_for_all)
+        color_for_all = self.controls.set_color_for_all_button.color_button
+        color_for_all.currentColorChanged.connect(self.preview_color_for_all)
+        color_for_all.colorSelected.connect(self.set_color_for_all)
+        color_for_all.rejected.connect(self.cancel_color_for_all)
         self.controls.restore_defaults_button.clicked.connect(self.reset_to_defaults)
         
 
-    def set_color_for_all(self, color: QColor):
-        """set all styles to the given color
+    def preview_color_for_all(self, color: QColor):
+        """shows every style in the given color while it's being picked; only the stylesheet is updated
         """
         for style in self.styles.values():
             style.fill = color.name()
+        mark_style_changes()
+
+    def set_color_for_all(self, color: QColor):
+        """set all styles to the given color
+        """
+        with batch_update():
+            for style in self.styles.values():
+                style.fill = color.name()
+            for entry in self.text_style_entries.values():
+                entry.color_button.color_button.setCurrentColor(color)
+            mark_style_changes()
+
+    def cancel_color_for_all(self):
+        """puts back the colors the preview replaced; each style's own color entry still has it
+        """
         for entry in self.text_style_entries.values():
-            entry.color_button.color_button.setCurrentColor(color)
-        mark_changes()
+            entry.style_model.fill = entry.color_button.color_button.currentColor().name()
+        mark_style_changes()
+
+    def refresh(self):
+        """shows the values currently in the global styles
+        """
+        with batch_update():
+            for entry in self.text_style_entries.values():
+                entry.set_values()
 
     def reset_to_defaults(self):
         # ? something better? maybe it should have a key to the global model?
         """reset all styles to their default values
         """
-        self.text_style_entries["Label"].style_model.update_from_other(TextStyling.label_defaults())
-        self.text_style_entries["Name"].style_model.update_from_other(TextStyling.name_defaults())
-        self.text_style_entries["Role"].style_model.update_from_other(TextStyling.role_defaults())
-        self.text_style_entries["Subtitle 1"].style_model.update_from_other(TextStyling.sub1_defaults())
-        self.text_style_entries["Subtitle 2"].style_model.update_from_other(TextStyling.sub2_defaults())
-        for entry in self.text_style_entries.values():
-            entry.set_values()
+        with batch_update():
+            self.text_style_entries["Label"].style_model.update_from_other(TextStyling.label_defaults())
+            self.text_style_entries["Name"].style_model.update_from_other(TextStyling.name_defaults())
+            self.text_style_entries["Role"].style_model.update_from_other(TextStyling.role_defaults())
+            self.text_style_entries["Subtitle 1"].style_model.update_from_other(TextStyling.sub1_defaults())
+            self.text_style_entries["Subtitle 2"].style_model.update_from_other(TextStyling.sub2_defaults())
+            for entry in self.text_style_entries.values():
+                entry.set_values()
+            mark_changes()
+
+class ListModificationControls(QWidget):
+    """a widget to control list modification
+    """
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        layout = QHBoxLayout()
+
+        # add new item button
+        self.add_item_button = QPushButton("Add Item", self)
+        layout.addWidget(self.add_item_button)
+
+        # delete item button
+        self.delete_item_button = QPushButton("Delete Item", self)
+        layout.addWidget(self.delete_item_button)
+
+        self.setLayout(layout)
+
+class NamesModel(QAbstractItemModel):
+    """a tree model of the global content: sections at the top level,
+    their names (and roles) as children
+    """
+    # internalId of a top level (section) index; a name's index stores its section's row + 1
+    SECTION_ID = 0
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, self.SECTION_ID)
+        return self.createIndex(row, column, parent.row() + 1)
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex: # type: ignore
+        if not index.isValid() or index.internalId() == self.SECTION_ID:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, self.SECTION_ID)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if not parent.isValid():
+            return len(content.names)
+        if parent.internalId() == self.SECTION_ID and parent.column() == 0:
+            return len(content.names[parent.row()]) - 1
+        return 0
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 2
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return ("Name", "Role")[section]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() == 0 or (content.include_roles and index.internalId() != self.SECTION_ID):
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        if index.internalId() == self.SECTION_ID:
+            return html.unescape(content.names[index.row()][0]) if index.column() == 0 else None
+        entry = content.names[index.internalId() - 1][index.row() + 1]
+        if not content.include_roles:
+            return html.unescape(entry) if index.column() == 0 else None
+        return html.unescape(entry.split(": ", 1)[index.column()])
+
+    def setData(self, index: QModelIndex, value, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole or not self.flags(index) & Qt.ItemFlag.ItemIsEditable:
+            return False
+        value = str(value)
+        if content.include_roles and index.internalId() != self.SECTION_ID and index.column() == 0 and ": " in value:
+            # the entry would split at the wrong place, moving the rest of the name into the role
+            return False
+        value = html.escape(value)
+        if index.internalId() == self.SECTION_ID:
+            content.names[index.row()][0] = value
+        else:
+            section = content.names[index.internalId() - 1]
+            if content.include_roles:
+                parts = section[index.row() + 1].split(": ", 1)
+                parts[index.column()] = value
+                value = ": ".join(parts)
+            section[index.row() + 1] = value
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole])
         mark_changes()
+        return True
 
-# # \TODO: Wire-up
-# class ListModificationControls(QWidget):
-#     """a widget to control list modification
-#     """
-#     def __init__(self, parent = None):
-#         super().__init__(parent)
-#         layout = QHBoxLayout()
-        
-#         # Section reorder buttons
-#         self.move_up_button = QPushButton("Move Up", self)
-#         layout.addWidget(self.move_up_button)
-#         self.move_down_button = QPushButton("Move Down", self)
-#         layout.addWidget(self.move_down_button)
+    def insertRows(self, row: int, count: int, parent: QModelIndex = QModelIndex()) -> bool:
+        """inserts blank names into a section, or blank sections at the top level
+        """
+        self.beginInsertRows(parent, row, row + count - 1)
+        if not parent.isValid():
+            content.names[row:row] = [["New Section"] for _ in range(count)]
+        else:
+            blank = "New Name: New Role" if content.include_roles else "New Name"
+            content.names[parent.row()][row + 1:row + 1] = [blank] * count
+        self.endInsertRows()
+        mark_changes()
+        return True
 
-#         # add new item button
-#         self.add_item_button = QPushButton("Add Item", self)
-#         layout.addWidget(self.add_item_button)
+    def removeRows(self, row: int, count: int, parent: QModelIndex = QModelIndex()) -> bool:
+        self.beginRemoveRows(parent, row, row + count - 1)
+        if not parent.isValid():
+            del content.names[row:row + count]
+        else:
+            del content.names[parent.row()][row + 1:row + 1 + count]
+        self.endRemoveRows()
+        mark_changes()
+        return True
 
-#         # delete item button
-#         self.delete_item_button = QPushButton("Delete Item", self)
-#         layout.addWidget(self.delete_item_button)
+    def reload(self):
+        """signals views that the global content was replaced wholesale
+        """
+        self.beginResetModel()
+        self.endResetModel()
 
-#         self.setLayout(layout)
+class NamesEditor(QWidget):
+    """a widget to edit sections, names and roles;
+    only the visible rows of the tree view get widgets
+    """
+    def __init__(self, model: NamesModel, parent = None):
+        super().__init__(parent)
+        layout = QVBoxLayout()
 
-# # \TODO: Wire-up
-# class NamesAndRolesControl(QWidget):
-#     """a widget to control names and roles settings
-#     """
-#     def __init__(self, parent = None):
-#         super().__init__(parent)
-#         layout = QVBoxLayout()
-        
-#         # roles enabled check box
-#         self.roles_enabled_button = QCheckBox("Enable Roles", self)
-#         layout.addWidget(self.roles_enabled_button)
-
-#         # section list view
-#          # Create a QStandardItemModel
-#         self.model = QStandardItemModel()
-
-#         # Add some items to the model
-#         items_data = ["Section 1", "Section 2", "Section 3"]
-#         for item_text in items_data:
-#             item = QStandardItem(item_text)
-#             self.model.appendRow(item)
-
-#         # Create a QListView
-#         self.list_view = QListView(self)
-#         self.list_view.setModel(self.model)
-#         self.list_view.setSelectionMode(QListView.SelectionMode.SingleSelection)
-#         layout.addWidget(self.list_view)
-
-#         # Section reorder buttons
-#         self.list_modification_controls = ListModificationControls(parent=self)
-#         layout.addWidget(self.list_modification_controls)
+        self.model = model
 
-#         self.setLayout(layout)
+        self.tree_view = QTreeView(self)
+        # lets the view lay out rows arithmetically instead of measuring each one
+        self.tree_view.setUniformRowHeights(True)
+        self.tree_view.setModel(self.model)
+        self.tree_view.setSelectionMode(QTreeView.SelectionMode.SingleSelection)
+        layout.addWidget(self.tree_view)
 
-# # \TODO: Wire-up
-# class CollapsibleNamesDialog(CollapsibleDialog):
-#     """a dialog to define names and roles with collapsible sections
-#     """
-#     def define_sections(self):
-        
-#         self.sections.append(("Controls", NamesAndRolesControl(parent=self)))
-        
-#         """define name sections
-#         """
-#         sections = {
-#             "Main Cast": [("Alice", "Protagonist"), ("Bob", "Antagonist")],
-#             "Supporting Cast": [("Charlie", "Supporting Role"), ("Dave", "Cameo")],
-#         }
-#         for section, participants in sections.items():
-#             widget = SectionEntry(section, roles_enabled = True, parent=self)
-#             for name, role in participants:
-#                 widget.add_participant(name, role)
-#             self.sections.append((section, widget))
+        self.list_modification_controls = ListModificationControls(parent=self)
+        self.list_modification_controls.add_item_button.clicked.connect(self.add_item)
+        self.list_modification_controls.delete_item_button.clicked.connect(self.delete_item)
+        layout.addWidget(self.list_modification_controls)
+
+        self.setLayout(layout)
+
+    def add_item(self):
+        """adds a name after the selected one, or a section if nothing is selected
+        """
+        index = self.tree_view.currentIndex()
+        if not index.isValid():
+            self.model.insertRows(self.model.rowCount(), 1)
+            return
+        if index.internalId() == NamesModel.SECTION_ID:
+            parent = index.siblingAtColumn(0)
+            row = self.model.rowCount(parent)
+        else:
+            parent = index.parent()
+            row = index.row() + 1
+        self.model.insertRows(row, 1, parent)
+        self.tree_view.expand(parent)
+
+    def delete_item(self):
+        index = self.tree_view.currentIndex()
+        if index.isValid():
+            self.model.removeRows(index.row(), 1, index.parent())
 
 # class CollapsibleMainDialog(CollapsibleDialog):
 #     """a dialog to define general settings with collapsible sections
@@ -688,7 +1229,7 @@ class CollapsibleStyleDialog(CollapsibleDialog):
 #         self.sections.append(("Spacing Settings", SpacingSettings(parent=self)))
 #         self.sections.append(("File Settings", FileSettings(parent=self)))
 #         self.sections.append(("Text Styles", CollapsibleStyleDialog(parent=self)))
-#         self.sections.append(("Names and Roles", CollapsibleNamesDialog(parent=self)))
+#         self.sections.append(("Names and Roles", NamesEditor(names_model, parent=self)))
 
 class SvgWidget(QWidget):
     def __init__(self, svg_content: QXmlStreamReader, parent=None):
@@ -697,32 +1238,204 @@ class SvgWidget(QWidget):
         self.renderer = QSvgRenderer()
         self.setMinimumSize(QSize(400, 200))
         self.renderer.setAspectRatioMode(Qt.AspectRatioMode.KeepAspectRatio)
+        # the layout of the loaded document, if known, and a newer one to draw as bars until the full render arrives
+        self.shown_layout: DocumentLayout | None = None
+        self.preview: DocumentLayout | None = None
+        self.paint_ms = 0.0
+        # when bars were last drawn (time.perf_counter())
+        self.preview_painted = 0.0
+        # (layout, font sizes, bars per class) of the last bars drawn; recoloring them, as while dragging a fill, reuses the bars
+        self.bar_cache: Tuple[DocumentLayout, Dict[str, float], Dict[str, List[QRectF]]] | None = None
         self.update_content(svg_content)
 
+        # a resize of a slow document is drawn as bars until it stops
+        self.resizing = False
+        self.settle_timer = QTimer()
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(PREVIEW_SETTLE_MS)
+        self.settle_timer.timeout.connect(self.resize_settled)
+
         self.timer = QTimer()
         self.timer.timeout.connect(update_svg)
         self.timer.setInterval(1000//24)
         self.timer.start()
 
-    def update_content(self, svg_content: QXmlStreamReader):
-        self.renderer.load(svg_content)
+        # stylesheet-only previews are cheap enough to keep up with the display
+        refresh_rate = self.screen().refreshRate() if self.screen() else 0
+        self.frame_interval = int(1000 // (refresh_rate or 60))
+        self.style_timer = QTimer()
+        self.style_timer.timeout.connect(update_svg_style)
+        self.style_timer.setInterval(self.frame_interval)
+        self.style_timer.start()
+
+    def update_content(self, svg_content: QXmlStreamReader, layout: DocumentLayout | None = None):
+        with timed("load"):
+            self.renderer.load(svg_content)
         if not self.renderer.isValid():
             print(f"Error: SvgRenderer failed to load SVG content.")
         self.renderer.setAspectRatioMode(Qt.AspectRatioMode.KeepAspectRatio)
+        self.shown_layout = layout
+        self.preview = None
+
+    def show_preview(self, layout: DocumentLayout):
+        """draws layout as bars until the next update_content
+        """
+        self.preview = layout
+        self.update()
+
+    def resizeEvent(self, event):
+        if self.shown_layout is not None and self.paint_ms > PREVIEW_BUDGET_MS:
+            self.resizing = True
+            self.settle_timer.start()
+        super().resizeEvent(event)
+
+    def resize_settled(self):
+        self.resizing = False
+        self.update()
+
+    def paint_bars(self, painter: QPainter, layout: DocumentLayout):
+        """draws every text of layout as a bar of roughly its size and color, straight from the positions:
+        no SVG, no fonts and no antialiasing
+        """
+        # * Fit the document like KeepAspectRatio does
+        scale = min(self.width() / layout.width, self.height() / layout.height)
+        painter.translate((self.width() - layout.width * scale) / 2, (self.height() - layout.height * scale) / 2)
+        painter.scale(scale, scale)
+
+        # * Gather bars per class so each color is one draw call
+        sizes = {class_: float(style.font_size.replace("px", "")) for class_, style in (
+            ("label", styling.label_style), ("name", styling.name_style), ("role", styling.role_style),
+            ("sub1", styling.sub1_style), ("sub2", styling.sub2_style),
+        )}
+        if self.bar_cache is not None and self.bar_cache[0] is layout and self.bar_cache[1] == sizes:
+            bars = self.bar_cache[2]
+        else:
+            bars = self.gather_bars(layout, sizes)
+            self.bar_cache = (layout, sizes, bars)
+
+        painter.setPen(Qt.PenStyle.NoPen)
+        for class_, rects in bars.items():
+            color = QColor(getattr(styling, f"{class_}_style").fill)
+            color.setAlphaF(0.6)
+            painter.setBrush(color)
+            painter.drawRects(rects)
+
+    def gather_bars(self, layout: DocumentLayout, sizes: Dict[str, float]) -> Dict[str, List[QRectF]]:
+        bars: Dict[str, List[QRectF]] = {class_: [] for class_ in ("label", "name", "role", "sub1", "sub2")}
+
+        def add_bar(class_: str, x: float, y: float, text: str):
+            size = sizes[class_]
+            # about half an em per character; the bar sits on the baseline like the text
+            width = len(text) * size * 0.5
+            bars[class_].append(QRectF(x - width / 2, y - size * 0.7, width, size * 0.7))
+
+        for section in layout.sections:
+            if section.title is not None:
+                add_bar("label", section.x, section.y, section.title)
+            for column in [*section.columns, section.remainder]:
+                for placed in column:
+                    add_bar("name", placed.x, placed.y, placed.name)
+                    if placed.role is not None:
+                        add_bar("role", placed.x, placed.y + layout_config.name_to_role, placed.role)
+        for text, x, y, class_ in layout.subtitles:
+            add_bar(class_, x, y, text)
+        return bars
 
     def paintEvent(self, event):
         # A QPainter operates on the widget (self) within the paintEvent
         painter = QPainter(self)
+
+        bars = self.preview if self.preview is not None else self.shown_layout if self.resizing else None
+        if bars is not None:
+            with timed("preview_paint"):
+                self.paint_bars(painter, bars)
+            self.preview_painted = time.perf_counter()
+            if self.resizing:
+                self.settle_timer.start()
+            return
         
         # Optional: Set a render hint for smoother output
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
 
         # Render the SVG to the painter on the specified bounds (the whole widget)
-        self.renderer.render(painter, self.rect())
+        start = time.perf_counter()
+        with timed("paint"):
+            self.renderer.render(painter, self.rect())
+        self.paint_ms = (time.perf_counter() - start) * 1000
         
         # The painter is closed automatically when exiting the paintEvent function scope
         # in Python bindings, though an explicit painter.end() can also be used.
 
+class RenderStatsPanel(QDialog):
+    """a dialog showing render timings per pipeline stage, refreshed while open
+    """
+    COLUMNS = ["count", "p50_ms", "p95_ms", "max_ms"]
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.setWindowTitle("Render Stats")
+        layout = QVBoxLayout()
+
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(["Count", "p50 (ms)", "p95 (ms)", "Max (ms)"])
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.counters_label = QLabel(self)
+        layout.addWidget(self.counters_label)
+
+        buttons = QHBoxLayout()
+        self.reset_button = QPushButton("Reset", self)
+        self.reset_button.clicked.connect(self.reset)
+        buttons.addWidget(self.reset_button)
+        self.save_button = QPushButton("Save JSON", self)
+        self.save_button.clicked.connect(self.save_json)
+        buttons.addWidget(self.save_button)
+        self.profile_button = QPushButton("Profile Next Render", self)
+        self.profile_button.clicked.connect(self.profile_next)
+        buttons.addWidget(self.profile_button)
+        layout.addLayout(buttons)
+
+        self.setLayout(layout)
+        self.setMinimumWidth(450)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.setInterval(500)
+        self.timer.start()
+        self.refresh()
+
+    def refresh(self):
+        summary = render_stats.summary()
+        self.table.setRowCount(len(summary))
+        self.table.setVerticalHeaderLabels(list(summary))
+        for row, values in enumerate(summary.values()):
+            for column, key in enumerate(self.COLUMNS):
+                text = str(values[key]) if key == "count" else f"{values[key]:.2f}"
+                self.table.setItem(row, column, QTableWidgetItem(text))
+        counters = [f"{k.replace('_', ' ')}: {v}" for k, v in render_stats.counters.items()]
+        counters.extend(
+            f"{name.replace('_', ' ')}: " + " ".join(f"{value}×{count}" for value, count in sorted(counts.items()))
+            for name, counts in render_stats.histograms.items()
+        )
+        self.counters_label.setText(", ".join(counters))
+
+    def reset(self):
+        render_stats.reset()
+        self.refresh()
+
+    def save_json(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Render Stats", "", "JSON Files (*.json)")
+        if file_name:
+            render_stats.dump(file_name)
+
+    def profile_next(self):
+        global profile_next_render
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Render Profile", "render.prof", "Profile Files (*.prof)")
+        if file_name:
+            profile_next_render = file_name
+            mark_changes()
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -742,7 +1455,11 @@ class MainWindow(QMainWindow):
         self.style_settings.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Expanding)
         layout.addWidget(self.style_settings, 0, 3)
         
-        # layout.addWidget(CollapsibleNamesDialog(parent=self), 1, 3)
+        global names_model
+        names_model = NamesModel(self)
+        self.names_editor = NamesEditor(names_model, parent=self)
+        self.names_editor.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Expanding)
+        layout.addWidget(self.names_editor, 1, 3)
         
         layout.addWidget(svg_widget, 0, 1, 2, 2)
 
@@ -751,6 +1468,25 @@ class MainWindow(QMainWindow):
         file_qmenu = self.menuBar().addMenu("&File")
         self.file_menu = FileMenu(self, file_qmenu)
 
+        global history
+        history = History(content, layout_config, styling)
+        edit_qmenu = self.menuBar().addMenu("&Edit")
+        self.edit_menu = EditMenu(self, edit_qmenu)
+        change_listeners.append(self.edit_menu.record)
+
+        debug_qmenu = self.menuBar().addMenu("&Debug")
+        stats_action = QAction("Render Stats", self)
+        stats_action.triggered.connect(self.stats_panel)
+        debug_qmenu.addAction(stats_action)
+        self.render_stats_panel = None
+        self.track_resources_action = QAction("Track Resources", self)
+        self.track_resources_action.setCheckable(True)
+        self.track_resources_action.toggled.connect(self.track_resources)
+        debug_qmenu.addAction(self.track_resources_action)
+        resource_report_action = QAction("Resource Report", self)
+        resource_report_action.triggered.connect(self.resource_report)
+        debug_qmenu.addAction(resource_report_action)
+
         help_qmenu = self.menuBar().addMenu("&Help")
         help_action = QAction("Show info", self)
         help_action.triggered.connect(self.help_dialog)
@@ -762,8 +1498,10 @@ class MainWindow(QMainWindow):
 
         global changes_since_save
         global changes_since_render
+        global changes_since_last_render
         changes_since_save = False
         changes_since_render = False
+        changes_since_last_render = 0
     
     def closeEvent(self, event: QCloseEvent) -> None:
         if not changes_since_save:
@@ -786,6 +1524,35 @@ class MainWindow(QMainWindow):
         
         event.accept()
 
+    def stats_panel(self):
+        if self.render_stats_panel is None:
+            self.render_stats_panel = RenderStatsPanel(parent=self)
+        self.render_stats_panel.show()
+        self.render_stats_panel.raise_()
+
+    def track_resources(self, enabled: bool):
+        """samples memory and Qt objects after every render while enabled; Python allocations run slower meanwhile
+        """
+        global diagnostics
+        if enabled:
+            diagnostics = Diagnostics()
+            diagnostics.start()
+        elif diagnostics:
+            diagnostics.stop()
+
+    def resource_report(self):
+        if diagnostics is None:
+            QMessageBox.information(self, "Resource Report", "Turn on Debug > Track Resources first.")
+            return
+        box = QMessageBox(QMessageBox.Icon.Information, "Resource Report", diagnostics.report(), parent=self)
+        save_button = box.addButton("Save JSON", QMessageBox.ButtonRole.ActionRole)
+        box.addButton(QMessageBox.StandardButton.Ok)
+        box.exec()
+        if box.clickedButton() is save_button:
+            file_name, _ = QFileDialog.getSaveFileName(self, "Save Resource Samples", "", "JSON Files (*.json)")
+            if file_name:
+                diagnostics.dump(file_name)
+
     def help_dialog(self):
         QMessageBox.information(
             self,
@@ -814,6 +1581,11 @@ class MainWindow(QMainWindow):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    # Edit > Sort Names collates in the user's locale; set explicitly rather than left to whatever Qt does on this platform
+    try:
+        set_collation_locale("")
+    except ValueError as e:
+        print(e.args[0])
 
     window = MainWindow()
     window.show()
@@ -0,0 +1,219 @@
+"""
+Undo/redo history of immutable document snapshots.
+
+Snapshots share everything that didn't change with the snapshot before them. Names
+are kept as tuples of chunks, and a chunk whose names are all the same string objects
+as before is reused instead of copied, so a step costs memory in proportion to what it
+changed rather than to the size of the roster. Sections read with map_names are
+immutable and kept as they are (the GUI reads names into lists, but scripts may not).
+
+Each entry can also hold the render of its state, so stepping back to it shows that
+render without laying the document out again.
+
+Usage:
+    history = History(content, layout_config, styling)
+    ...edit...
+    history.record(content, layout_config, styling)
+    entry = history.undo()
+    history.restore(entry, content, layout_config, styling)
+"""
+from collections import deque
+from dataclasses import dataclass
+from itertools import chain
+from operator import is_
+import time
+from typing import Deque, Dict, List, Sequence, Tuple
+
+from data import Content, FrozenFullStyling, FrozenLayoutConfig, FullStyling, LayoutConfig, MappedSection
+from gen import DocumentLayout
+
+# names per chunk when a run of names is copied into a snapshot
+CHUNK_SIZE = 256
+# entries kept before the oldest are forgotten
+MAX_ENTRIES = 500
+# entries that keep their render; renders are the size of the whole document
+MAX_RENDERS = 8
+# consecutive layout or styling changes closer together than this are one step (e.g. holding a spin box arrow)
+COALESCE_SECONDS = 1.0
+
+Chunks = Tuple[Tuple[str, ...], ...]
+
+def chunked(names: Sequence[str]) -> Chunks:
+    return tuple(tuple(names[i:i + CHUNK_SIZE]) for i in range(0, len(names), CHUNK_SIZE))
+
+def _same(chunk: Tuple[str, ...], names: List[str], start: int) -> bool:
+    return start + len(chunk) <= len(names) and all(map(is_, chunk, names[start:start + len(chunk)]))
+
+def share_names(names: List[str], previous: Chunks) -> Chunks:
+    """the chunks of names, reusing every chunk of previous that still appears unchanged at the start or end;
+    only the changed run in between is copied
+    """
+    # * Leading chunks that are unchanged
+    head = 0
+    start = 0
+    while head < len(previous) and _same(previous[head], names, start):
+        start += len(previous[head])
+        head += 1
+    if head == len(previous) and start == len(names):
+        return previous
+
+    # * Trailing chunks that are unchanged and don't overlap the leading ones
+    tail = len(previous)
+    stop = len(names)
+    while tail > head and stop - len(previous[tail - 1]) >= start and _same(previous[tail - 1], names, stop - len(previous[tail - 1])):
+        stop -= len(previous[tail - 1])
+        tail -= 1
+
+    return previous[:head] + chunked(names[start:stop]) + previous[tail:]
+
+def flatten(chunks: Chunks) -> List[str]:
+    return list(chain.from_iterable(chunks))
+
+@dataclass(frozen=True, eq=False)
+class Snapshot:
+    # chunked names per section, or a MappedSection as it is
+    sections: Tuple[Chunks | MappedSection, ...]
+    subtitles: Tuple[str, ...]
+    include_roles: bool
+    layout: FrozenLayoutConfig
+    styling: FrozenFullStyling
+
+@dataclass(eq=False)
+class HistoryEntry:
+    snapshot: Snapshot
+    # what changed from the entry before: "names", "layout" or "styling"
+    kind: str
+    time: float
+    svg_text: str | None = None
+    layout: DocumentLayout | None = None
+
+class History:
+    """a linear undo/redo stack; entries[position] is the state currently shown
+    """
+    def __init__(self, content: Content, config: LayoutConfig, text_styling: FullStyling):
+        self.entries: List[HistoryEntry] = []
+        self.position = -1
+        # id of a live section list -> (that list, the chunks it was last recorded or restored as)
+        self.live_sections: Dict[int, Tuple[List[str], Chunks]] = {}
+        # entries holding a render, oldest first
+        self.rendered: Deque[HistoryEntry] = deque()
+        # the entry record() last added, which later changes of the same kind may replace
+        self.last_recorded: HistoryEntry | None = None
+        self.entries.append(HistoryEntry(self.snapshot(content, config, text_styling), "names", time.monotonic()))
+        self.position = 0
+
+    def current(self) -> HistoryEntry:
+        return self.entries[self.position]
+
+    def snapshot(self, content: Content, config: LayoutConfig, text_styling: FullStyling) -> Snapshot:
+        """the current state, sharing every unchanged part with the current entry
+        """
+        previous = self.entries[self.position].snapshot if self.entries else None
+
+        live_sections = {}
+        sections = []
+        for section in content.names:
+            if not isinstance(section, list):
+                sections.append(section)
+                continue
+            known = self.live_sections.get(id(section))
+            chunks = share_names(section, known[1]) if known is not None and known[0] is section else chunked(section)
+            live_sections[id(section)] = (section, chunks)
+            sections.append(chunks)
+        self.live_sections = live_sections
+
+        layout = config.freeze()
+        frozen_styling = text_styling.freeze()
+        subtitles = tuple(content.subtitles)
+        if previous is not None:
+            # equal small parts are shared too, which also lets record() compare them by identity
+            layout = previous.layout if layout == previous.layout else layout
+            frozen_styling = previous.styling if frozen_styling == previous.styling else frozen_styling
+            subtitles = previous.subtitles if subtitles == previous.subtitles else subtitles
+        return Snapshot(tuple(sections), subtitles, content.include_roles, layout, frozen_styling)
+
+    def record(self, content: Content, config: LayoutConfig, text_styling: FullStyling):
+        """adds the current state as a new step, dropping anything that could have been redone;
+        does nothing if nothing changed
+        """
+        snapshot = self.snapshot(content, config, text_styling)
+        previous = self.current().snapshot
+        names_changed = (
+            len(snapshot.sections) != len(previous.sections)
+            or not all(map(is_, snapshot.sections, previous.sections))
+            or snapshot.subtitles is not previous.subtitles
+            or snapshot.include_roles != previous.include_roles
+        )
+        if names_changed:
+            kind = "names"
+        elif snapshot.layout is not previous.layout:
+            kind = "layout"
+        elif snapshot.styling is not previous.styling:
+            kind = "styling"
+        else:
+            return
+
+        now = time.monotonic()
+        del self.entries[self.position + 1:]
+        top = self.current()
+        if kind != "names" and top is self.last_recorded and top.kind == kind and now - top.time < COALESCE_SECONDS:
+            self.entries.pop()
+            if top in self.rendered:
+                self.rendered.remove(top)
+        self.last_recorded = HistoryEntry(snapshot, kind, now)
+        self.entries.append(self.last_recorded)
+        if len(self.entries) > MAX_ENTRIES:
+            del self.entries[:len(self.entries) - MAX_ENTRIES]
+        self.position = len(self.entries) - 1
+
+    def attach_render(self, svg_text: str, layout: DocumentLayout | None):
+        """keeps the render of the current state with its entry; only the latest few renders are kept
+        """
+        entry = self.current()
+        if entry.svg_text is None:
+            self.rendered.append(entry)
+        entry.svg_text = svg_text
+        entry.layout = layout
+        while len(self.rendered) > MAX_RENDERS:
+            old = self.rendered.popleft()
+            old.svg_text = None
+            old.layout = None
+
+    def can_undo(self) -> bool:
+        return self.position > 0
+
+    def can_redo(self) -> bool:
+        return self.position < len(self.entries) - 1
+
+    def undo(self) -> HistoryEntry:
+        self.position -= 1
+        return self.current()
+
+    def redo(self) -> HistoryEntry:
+        self.position += 1
+        return self.current()
+
+    def restore(self, entry: HistoryEntry, content: Content, config: LayoutConfig, text_styling: FullStyling):
+        """puts entry's state into the live objects in place; live sections already matching it are kept as they are
+        """
+        snapshot = entry.snapshot
+        by_chunks = {id(chunks): section for section, chunks in self.live_sections.values()}
+        live_sections = {}
+        names = []
+        for chunks in snapshot.sections:
+            if isinstance(chunks, MappedSection):
+                names.append(chunks)
+                continue
+            section = by_chunks.get(id(chunks))
+            if section is None:
+                section = flatten(chunks)
+            live_sections[id(section)] = (section, chunks)
+            names.append(section)
+        self.live_sections = live_sections
+
+        content.names = names
+        content.subtitles = list(snapshot.subtitles)
+        content.include_roles = snapshot.include_roles
+        for key, value in snapshot.layout.get_all_keys_and_values().items():
+            config.set_value(key, value)
+        text_styling.update_from_other(snapshot.styling)
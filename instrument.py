@@ -0,0 +1,121 @@
+"""
+Timing hooks and counters for the render pipeline.
+
+Usage:
+    with timed("layout"):
+        ...
+
+    @timed("parse")
+    def process_names(...): ...
+
+    print(render_stats.to_json())
+"""
+import cProfile
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import io
+import json
+import pstats
+import time
+from typing import Deque, Dict, Iterator
+
+# pipeline stages in the order they happen, used to order reports
+STAGES = ["parse", "sort", "layout", "build", "serialize", "load", "paint", "render", "restyle", "preview", "preview_paint"]
+
+# samples kept per stage, so long sessions don't grow without bound
+MAX_SAMPLES = 2000
+
+@dataclass
+class StageTimings:
+    samples: Deque[float] = field(default_factory=lambda: deque(maxlen=MAX_SAMPLES))
+    count: int = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def summary(self) -> Dict[str, float]:
+        """count plus p50/p95/max in milliseconds
+        """
+        return {
+            "count": self.count,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "max_ms": max(self.samples, default=0.0) * 1000,
+        }
+
+@dataclass
+class RenderStats:
+    stages: Dict[str, StageTimings] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    # name -> value -> how often it was observed, e.g. change notifications per render
+    histograms: Dict[str, Dict[int, int]] = field(default_factory=dict)
+
+    def record(self, stage: str, seconds: float):
+        self.stages.setdefault(stage, StageTimings()).add(seconds)
+
+    def increment(self, counter: str, amount: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def observe(self, histogram: str, value: int):
+        counts = self.histograms.setdefault(histogram, {})
+        counts[value] = counts.get(value, 0) + 1
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+        self.histograms.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        ordered = sorted(self.stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+        return {stage: self.stages[stage].summary() for stage in ordered}
+
+    def to_json(self) -> str:
+        histograms = {name: dict(sorted(counts.items())) for name, counts in self.histograms.items()}
+        return json.dumps({"stages": self.summary(), "counters": self.counters, "histograms": histograms}, indent=2)
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+render_stats = RenderStats()
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """records the wall time of the block (or decorated function) under the given stage
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        render_stats.record(stage, time.perf_counter() - start)
+
+@contextmanager
+def profiled(path: str | None) -> Iterator[cProfile.Profile | None]:
+    """runs the block under cProfile and writes the raw profile to path;
+    a no-op yielding None when path is None
+    """
+    if path is None:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+def profile_report(profiler: cProfile.Profile, limit: int = 25) -> str:
+    """the top functions of a finished profile by cumulative time
+    """
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
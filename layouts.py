@@ -0,0 +1,230 @@
+"""
+Layout strategies: how the names of a section are arranged into rows and columns.
+
+A strategy places a whole section at once, returning a (column, row) pair per name.
+Columns are in column units (0 is the leftmost column, fractions fall between
+columns) and rows count down from the section label. Strategies are registered by
+name and picked with LayoutConfig.layout_strategy, and get the styling of the render
+they're placing names for, for strategies that measure text.
+
+Usage:
+    @register_layout("my_layout")
+    class MyLayout(GridLayout):
+        def remainder_positions(self, count, columns):
+            ...
+
+    add_layout("thirds", RemainderPatternLayout({2: [0.5, 3.5]}))
+"""
+import html
+from typing import Dict, List, Sequence, Tuple
+
+from data import FullStyling, LayoutConfig
+
+# (column, row) per name
+Positions = List[Tuple[float, int]]
+
+LAYOUT_STRATEGIES: Dict[str, "LayoutStrategy"] = {}
+
+def register_layout(name: str):
+    """class decorator registering an instance of the strategy under name
+    """
+    def register(cls):
+        LAYOUT_STRATEGIES[name] = cls()
+        return cls
+    return register
+
+def add_layout(name: str, strategy: "LayoutStrategy"):
+    LAYOUT_STRATEGIES[name] = strategy
+
+def get_layout(name: str) -> "LayoutStrategy":
+    try:
+        return LAYOUT_STRATEGIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown layout strategy '{name}'. Choose one of: {', '.join(LAYOUT_STRATEGIES)}.") from None
+
+class LayoutStrategy:
+    """reimplement place(); row_count() and prefix_for_rows() only need reimplementing when they can be done cheaper
+    """
+    # whether placing names measures text with Qt, which then has to be started on the main thread
+    measures_text = False
+
+    def place(self, names: Sequence[str], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> Positions:
+        raise NotImplementedError
+
+    def row_count(self, names: Sequence[str], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> int:
+        return max((row for _, row in self.place(names, include_roles, config, text_styling)), default=-1) + 1
+
+    def prefix_for_rows(self, names: Sequence[str], rows: int, include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> int:
+        """the most leading names that, laid out on their own, take at most rows rows; used to split sections across pages
+        """
+        low, high = 0, len(names)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.row_count(names[:middle], include_roles, config, text_styling) <= rows:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+@register_layout("grid")
+class GridLayout(LayoutStrategy):
+    """full rows left to right, with the last, partial row arranged by remainder_positions()
+    """
+    def remainder_positions(self, count: int, columns: int) -> List[float]:
+        # centered
+        return [((columns - count) / 2) + i for i in range(count)]
+
+    def place(self, names: Sequence[str], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> Positions:
+        columns = config.columns
+        core = len(names) - len(names) % columns
+        positions: Positions = [(i % columns, i // columns) for i in range(core)]
+        last_row = core // columns
+        positions.extend((column, last_row) for column in self.remainder_positions(len(names) - core, columns))
+        return positions
+
+    def row_count(self, names: Sequence[str], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> int:
+        return -(-len(names) // config.columns)
+
+    def prefix_for_rows(self, names: Sequence[str], rows: int, include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> int:
+        return min(len(names), rows * config.columns)
+
+@register_layout("left")
+class LeftLayout(GridLayout):
+    def remainder_positions(self, count: int, columns: int) -> List[float]:
+        return [float(i) for i in range(count)]
+
+@register_layout("justified")
+class JustifiedLayout(GridLayout):
+    """the last row is spread across the full width
+    """
+    def remainder_positions(self, count: int, columns: int) -> List[float]:
+        if count == 1:
+            return [(columns - 1) / 2]
+        return [i * (columns - 1) / (count - 1) for i in range(count)]
+
+class RemainderPatternLayout(GridLayout):
+    """custom last rows: patterns maps a remainder length to its column positions;
+    lengths without a pattern are centered
+    """
+    def __init__(self, patterns: Dict[int, List[float]]):
+        for count, pattern in patterns.items():
+            if len(pattern) != count:
+                raise ValueError(f"The pattern for {count} names has {len(pattern)} positions.")
+        self.patterns = patterns
+
+    def remainder_positions(self, count: int, columns: int) -> List[float]:
+        pattern = self.patterns.get(count)
+        return list(pattern) if pattern is not None else super().remainder_positions(count, columns)
+
+@register_layout("balanced")
+class BalancedLayout(GridLayout):
+    """the same number of rows as the grid, with names spread so row lengths differ by at most one;
+    longer rows come first and every row is centered
+    """
+    def place(self, names: Sequence[str], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> Positions:
+        columns = config.columns
+        rows = self.row_count(names, include_roles, config, text_styling)
+        positions: Positions = []
+        if rows == 0:
+            return positions
+        base, longer = divmod(len(names), rows)
+        for row in range(rows):
+            count = base + (1 if row < longer else 0)
+            offset = (columns - count) / 2
+            positions.extend((offset + i, row) for i in range(count))
+        return positions
+
+@register_layout("column_major")
+class ColumnMajorLayout(GridLayout):
+    """names run down each column before moving right; unused columns are split evenly between the sides
+    """
+    def place(self, names: Sequence[str], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> Positions:
+        rows = self.row_count(names, include_roles, config, text_styling)
+        if rows == 0:
+            return []
+        used = -(-len(names) // rows)
+        offset = (config.columns - used) / 2
+        return [(offset + i // rows, i % rows) for i in range(len(names))]
+
+@register_layout("packed")
+class PackedLayout(LayoutStrategy):
+    """names keep their order but take only as much width as their text needs: each row holds as many names as fit
+    in the canvas width, then rows are narrowed as far as possible without adding a row so their lengths even out.
+    Widths are measured with Qt in the fonts of the styling being rendered
+    """
+    measures_text = True
+
+    def __init__(self, padding: float = 30):
+        # minimum space between neighbouring names
+        self.padding = padding
+
+    def widths(self, names: Sequence[str], include_roles: bool, text_styling: FullStyling) -> List[float]:
+        from outlines import font_key, glyph_cache
+
+        name_font = font_key(text_styling.name_style)
+        role_font = font_key(text_styling.role_style)
+        widths = []
+        for name in names:
+            role = None
+            if include_roles:
+                name, role = name.split(": ", 1)
+            width = glyph_cache.run(name_font, html.unescape(name))[1]
+            if role is not None:
+                width = max(width, glyph_cache.run(role_font, html.unescape(role))[1])
+            widths.append(width)
+        return widths
+
+    def usable_width(self, config: LayoutConfig) -> float:
+        # the span the grid's columns cover, from the left edge of its first column to the right edge of its last
+        return config.columns * config.name_to_name_horizontal
+
+    def break_rows(self, widths: List[float], row_width: float) -> List[int]:
+        """the index each row starts at, filling rows greedily; a name wider than row_width gets a row of its own.
+        For names in a fixed order, greedy filling gives the fewest rows
+        """
+        starts = []
+        used = 0.0
+        for i, width in enumerate(widths):
+            if i == 0 or used + self.padding + width > row_width:
+                starts.append(i)
+                used = width
+            else:
+                used += self.padding + width
+        return starts
+
+    def place(self, names: Sequence[str], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> Positions:
+        widths = self.widths(names, include_roles, text_styling)
+        if not widths:
+            return []
+        usable = self.usable_width(config)
+        starts = self.break_rows(widths, usable)
+
+        # * Narrow the rows: binary search the smallest width that still needs no more rows
+        low, high = max(widths), usable
+        while high - low > 1:
+            middle = (low + high) / 2
+            if len(self.break_rows(widths, middle)) <= len(starts):
+                high = middle
+            else:
+                low = middle
+        if high < usable:
+            starts = self.break_rows(widths, high)
+
+        # * Center each row, converting x to column units
+        pitch = config.name_to_name_horizontal
+        center_column = (config.columns - 1) / 2
+        positions: Positions = []
+        for row, (start, stop) in enumerate(zip(starts, [*starts[1:], len(widths)])):
+            row_width = sum(widths[start:stop]) + self.padding * (stop - start - 1)
+            x = -row_width / 2
+            for width in widths[start:stop]:
+                positions.append((center_column + (x + width / 2) / pitch, row))
+                x += width + self.padding
+        return positions
+
+    def row_count(self, names: Sequence[str], include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> int:
+        return len(self.break_rows(self.widths(names, include_roles, text_styling), self.usable_width(config)))
+
+    def prefix_for_rows(self, names: Sequence[str], rows: int, include_roles: bool, config: LayoutConfig, text_styling: FullStyling) -> int:
+        starts = self.break_rows(self.widths(names, include_roles, text_styling), self.usable_width(config))
+        return starts[rows] if rows < len(starts) else len(names)
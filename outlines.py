@@ -0,0 +1,178 @@
+"""
+Text-to-outline emitter: every glyph is extracted once per (font, glyph, size)
+into a <path> in <defs>, every distinct string is built once from <use>s of
+those glyphs, and each text element becomes one <use> of its string. The output
+looks the same on machines without the fonts and viewers never do font fallback.
+
+Needs Qt for font access; without a running Qt application an offscreen one
+is started.
+
+Usage:
+    svg_text = render_svg_string(content, config, styling, outline_text=True)
+"""
+from dataclasses import dataclass, field
+import html
+from typing import Dict, List, Set, Tuple
+
+from PySide6.QtGui import QFont, QPainterPath, QRawFont
+
+from data import FullStyling, LayoutConfig, TextStyling
+from export import ensure_gui_application
+from gen import DocumentLayout
+
+# (family, pixel size, bold, italic)
+FontKey = Tuple[str, float, bool, bool]
+
+# the FullStyling attribute behind each CSS class
+STYLE_FOR_CLASS = {
+    "name": "name_style",
+    "role": "role_style",
+    "label": "label_style",
+    "sub1": "sub1_style",
+    "sub2": "sub2_style",
+}
+
+# cached shaped strings per font before the run cache is cleared
+MAX_RUNS = 50000
+
+def font_key(style: TextStyling) -> FontKey:
+    return (style.font_family, float(style.font_size.replace("px", "")), style.font_weight == "bold", style.font_style == "italic")
+
+def _number(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+def path_data(path: QPainterPath) -> str:
+    """the SVG path commands of a QPainterPath
+    """
+    commands = []
+    i = 0
+    count = path.elementCount()
+    while i < count:
+        element = path.elementAt(i)
+        if element.isMoveTo():
+            commands.append(f"M{_number(element.x)} {_number(element.y)}")
+        elif element.isLineTo():
+            commands.append(f"L{_number(element.x)} {_number(element.y)}")
+        else:
+            # a curve is its first control point followed by two CurveToData elements
+            c2 = path.elementAt(i + 1)
+            end = path.elementAt(i + 2)
+            commands.append(f"C{_number(element.x)} {_number(element.y)} {_number(c2.x)} {_number(c2.y)} {_number(end.x)} {_number(end.y)}")
+            i += 2
+        i += 1
+    return "".join(commands) + "Z" if commands else ""
+
+@dataclass
+class GlyphCache:
+    """glyph outlines and shaped strings, shared across renders for the life of the process
+    """
+    fonts: Dict[FontKey, QRawFont] = field(default_factory=dict)
+    # (font, glyph index) -> (def id, path data)
+    glyphs: Dict[Tuple[FontKey, int], Tuple[str, str]] = field(default_factory=dict)
+    # (font, text) -> ([(def id, x offset)], total advance); def id is None for blank glyphs like spaces
+    runs: Dict[Tuple[FontKey, str], Tuple[List[Tuple[str | None, float]], float]] = field(default_factory=dict)
+
+    def raw_font(self, key: FontKey) -> QRawFont:
+        raw_font = self.fonts.get(key)
+        if raw_font is None:
+            ensure_gui_application()
+            family, size, bold, italic = key
+            font = QFont(family)
+            font.setPixelSize(max(1, round(size)))
+            font.setBold(bold)
+            font.setItalic(italic)
+            raw_font = QRawFont.fromFont(font)
+            self.fonts[key] = raw_font
+        return raw_font
+
+    def glyph(self, key: FontKey, index: int) -> str | None:
+        cached = self.glyphs.get((key, index))
+        if cached is None:
+            path = self.raw_font(key).pathForGlyph(index)
+            cached = (f"g{len(self.glyphs)}", path_data(path))
+            self.glyphs[(key, index)] = cached
+        return cached[0] if cached[1] else None
+
+    def run(self, key: FontKey, text: str) -> Tuple[List[Tuple[str | None, float]], float]:
+        cached = self.runs.get((key, text))
+        if cached is None:
+            raw_font = self.raw_font(key)
+            indexes = raw_font.glyphIndexesForString(text)
+            advances = raw_font.advancesForGlyphIndexes(indexes, QRawFont.LayoutFlag.KernedAdvances)
+            placed = []
+            offset = 0.0
+            for index, advance in zip(indexes, advances):
+                placed.append((self.glyph(key, index), offset))
+                offset += advance.x()
+            if len(self.runs) >= MAX_RUNS:
+                self.runs.clear()
+            cached = (placed, offset)
+            self.runs[(key, text)] = cached
+        return cached
+
+    def path_by_id(self) -> Dict[str, str]:
+        return {def_id: data for def_id, data in self.glyphs.values()}
+
+glyph_cache = GlyphCache()
+
+@dataclass
+class OutlineWriter:
+    """emits outlined text for one document: each distinct string is defined once as a group of glyph
+    references and every occurrence is a single <use> of it
+    """
+    keys: Dict[str, FontKey]
+    cache: GlyphCache = field(default_factory=lambda: glyph_cache)
+    glyphs_used: Set[str] = field(default_factory=set)
+    # (font, text) -> (run id, run definition)
+    runs: Dict[Tuple[FontKey, str], Tuple[str, str]] = field(default_factory=dict)
+
+    def text(self, class_: str, x: float, y: float, text: str) -> str:
+        if not text:
+            return f'<g class="{class_}"/>'
+        key = (self.keys[class_], text)
+        run = self.runs.get(key)
+        if run is None:
+            placed, width = self.cache.run(key[0], html.unescape(text))
+            # text-anchor: middle
+            start = -width / 2
+            uses = []
+            for def_id, offset in placed:
+                if def_id is not None:
+                    self.glyphs_used.add(def_id)
+                    uses.append(f'<use xlink:href="#{def_id}" x="{_number(start + offset)}"/>')
+            run_id = f"r{len(self.runs)}"
+            run = (run_id, f'<g id="{run_id}">{"".join(uses)}</g>')
+            self.runs[key] = run
+        return f'<use xlink:href="#{run[0]}" class="{class_}" x="{_number(x)}" y="{_number(y)}"/>'
+
+    def defs(self) -> str:
+        paths = self.cache.path_by_id()
+        glyphs = "".join(f'<path id="{def_id}" d="{paths[def_id]}"/>' for def_id in sorted(self.glyphs_used, key=lambda d: int(d[1:])))
+        return "<defs>" + glyphs + "".join(definition for _, definition in self.runs.values()) + "</defs>"
+
+def emit_outlined_svg(layout: DocumentLayout, config: LayoutConfig, text_styling: FullStyling) -> str:
+    """the same document as emit_svg with every text element replaced by glyph outlines
+    """
+    writer = OutlineWriter({class_: font_key(getattr(text_styling, attribute)) for class_, attribute in STYLE_FOR_CLASS.items()})
+
+    body = []
+    for section in layout.sections:
+        body.append("<g>")
+        if section.title is not None:
+            body.append(writer.text("label", section.x, section.y, section.title))
+        for column in [*section.columns, section.remainder]:
+            for placed in column:
+                body.append(writer.text("name", placed.x, placed.y, placed.name))
+                if placed.role is not None:
+                    body.append(writer.text("role", placed.x, placed.y + config.name_to_role, placed.role))
+        body.append("</g>")
+    for text, x, y, class_ in layout.subtitles:
+        body.append(writer.text(class_, x, y, text))
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="{layout.width}" height="{layout.height}">'
+        f"<style>{text_styling}</style>"
+        + writer.defs()
+        + "".join(body)
+        + "</svg>"
+    )
@@ -0,0 +1,139 @@
+"""
+Project files: names, layout settings, text styles and the last render in one file.
+
+The format is JSON lines:
+    line 1      header: settings, subtitles, and an index of every section line (title, name count, offset, length)
+    next lines  one JSON list per section, its title first
+    last line   the cached SVG, if one was saved
+
+Offsets are relative to the end of the header line, so opening a project only has to
+read the header to apply its settings and show the cached render; sections can then
+be read on demand or streamed in the background.
+
+Usage:
+    save_project("show.names", content, layout_config, styling, svg_text)
+    with ProjectReader("show.names") as project:
+        preview = project.cached_svg()
+        content = project.load_content()
+"""
+import hashlib
+import json
+from typing import BinaryIO, Iterator, List
+
+from data import Content, FullStyling, LayoutConfig
+
+FORMAT = "names-svg-project"
+VERSION = 1
+# what every header has besides the format
+HEADER_KEYS = ("version", "layout", "styling", "include_roles", "subtitles", "sections", "cache")
+
+def fingerprint(content: Content, config: LayoutConfig, text_styling: FullStyling) -> str:
+    """a digest of everything a render depends on
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps([config.get_all_keys_and_values(), text_styling.to_dict(), content.subtitles, content.include_roles]).encode())
+    for section in content.names:
+        digest.update(json.dumps(list(section)).encode())
+    return digest.hexdigest()
+
+def save_project(path: str, content: Content, config: LayoutConfig, text_styling: FullStyling, svg_text: str | None = None):
+    """writes a project; svg_text should be the render of exactly these settings and names
+    """
+    body: List[bytes] = []
+    index = []
+    offset = 0
+    for section in content.names:
+        line = json.dumps(list(section), ensure_ascii=False).encode() + b"\n"
+        index.append([section[0], len(section) - 1, offset, len(line)])
+        body.append(line)
+        offset += len(line)
+
+    cache = None
+    if svg_text is not None:
+        line = json.dumps(svg_text, ensure_ascii=False).encode() + b"\n"
+        cache = {"fingerprint": fingerprint(content, config, text_styling), "offset": offset, "length": len(line)}
+        body.append(line)
+
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "layout": config.get_all_keys_and_values(),
+        "styling": text_styling.to_dict(),
+        "include_roles": content.include_roles,
+        "subtitles": content.subtitles,
+        "sections": index,
+        "cache": cache,
+    }
+    with open(path, "wb") as f:
+        f.write(json.dumps(header, ensure_ascii=False).encode() + b"\n")
+        f.writelines(body)
+
+class ProjectReader:
+    """reads a project's header on open; sections and the cached render are read on request
+    """
+    def __init__(self, path: str):
+        self.file: BinaryIO = open(path, "rb")
+        try:
+            self.read_header(path)
+        except BaseException:
+            self.file.close()
+            raise
+
+    def read_header(self, path: str):
+        try:
+            header = json.loads(self.file.readline())
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ValueError(f"'{path}' is not a project file.") from e
+        if not isinstance(header, dict) or header.get("format") != FORMAT:
+            raise ValueError(f"'{path}' is not a project file.")
+        missing = [key for key in HEADER_KEYS if key not in header]
+        if missing:
+            raise ValueError(f"'{path}' is damaged: its header has no {', '.join(missing)}.")
+        if header["version"] > VERSION:
+            raise ValueError(f"'{path}' was saved by a newer version (format {header['version']}).")
+
+        self.body_start = self.file.tell()
+        self.config = LayoutConfig.from_dict(header["layout"])
+        self.styling = FullStyling.from_dict(header["styling"])
+        self.include_roles: bool = header["include_roles"]
+        self.subtitles: List[str] = header["subtitles"]
+        # [title, name count, offset, length] per section
+        self.index: List[list] = header["sections"]
+        self.cache: dict | None = header["cache"]
+
+    def _read(self, offset: int, length: int):
+        self.file.seek(self.body_start + offset)
+        return json.loads(self.file.read(length))
+
+    def section_titles(self) -> List[str]:
+        return [entry[0] for entry in self.index]
+
+    def name_count(self) -> int:
+        return sum(entry[1] for entry in self.index)
+
+    def read_section(self, i: int) -> List[str]:
+        _, _, offset, length = self.index[i]
+        return self._read(offset, length)
+
+    def iter_sections(self) -> Iterator[List[str]]:
+        for i in range(len(self.index)):
+            yield self.read_section(i)
+
+    def load_content(self) -> Content:
+        return Content(list(self.iter_sections()), self.subtitles, self.include_roles)
+
+    def cached_svg(self) -> str | None:
+        """the render saved with the project, which matches its settings and names
+        """
+        if self.cache is None:
+            return None
+        return self._read(self.cache["offset"], self.cache["length"])
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,221 @@
+"""
+Local HTTP render service with warm worker processes.
+
+POST /render with a JSON body:
+    {"names": "<names file text>", "layout": {"columns": 4, ...}, "styling": {"name_style": {"fill": "#000"}, ...}}
+returns the SVG, with X-Render-* timing headers. "layout" and "styling" are optional
+and only need the settings that differ from the defaults.
+
+Identical requests that arrive while one is already rendering share its result.
+
+Usage:
+    python3 server.py --port 8765
+    python3 server.py --socket /tmp/names-svg.sock
+"""
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, Tuple
+
+from data import Content, FullStyling, LayoutConfig, process_names
+from gen import render_svg_string
+
+def _warm_up():
+    """the workers' initializer, so the first real request doesn't pay for imports and first-call costs
+    """
+    render_svg_string(Content([["Warm Up", "Name: Role"]], [], True), LayoutConfig(), FullStyling())
+
+def render_request(names: str, layout: Dict[str, int], styling: Dict[str, Dict[str, str]]) -> Tuple[str, Dict[str, float]]:
+    """worker side: parses and renders one request, returning the SVG and stage timings in ms
+    """
+    start = time.perf_counter()
+    content = process_names(names)
+    config = LayoutConfig.from_dict(layout)
+    text_styling = FullStyling.from_dict(styling)
+    parsed = time.perf_counter()
+    svg_text = render_svg_string(content, config, text_styling)
+    rendered = time.perf_counter()
+    return (svg_text, {"Parse": (parsed - start) * 1000, "Render": (rendered - parsed) * 1000})
+
+class RenderService:
+    """a pool of warm render workers that coalesces identical in-flight requests
+    """
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, Future] = {}
+        self.pool = self.start_pool()
+
+    def start_pool(self) -> ProcessPoolExecutor:
+        """a pool whose workers have all started (and warmed up in their initializer) before it's returned
+        """
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up)
+        # submitting starts the workers; the initializer warms each one whichever of them runs these
+        for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def render(self, request: Dict) -> Tuple[str, Dict[str, float], bool]:
+        """renders a decoded request body; returns the SVG, timings and whether it joined an in-flight render
+        """
+        names = request.get("names")
+        if not isinstance(names, str):
+            raise ValueError("The request needs a 'names' string.")
+        layout = request.get("layout") or {}
+        styling = request.get("styling") or {}
+        key = hashlib.sha256(json.dumps([names, layout, styling], sort_keys=True).encode()).hexdigest()
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            coalesced = future is not None
+            if future is None:
+                try:
+                    future = self.pool.submit(render_request, names, layout, styling)
+                except BrokenProcessPool:
+                    # a worker died (e.g. killed for memory); the requests it took down failed, later ones get a new pool
+                    self.pool.shutdown(wait=False)
+                    self.pool = self.start_pool()
+                    future = self.pool.submit(render_request, names, layout, styling)
+                self.in_flight[key] = future
+        if not coalesced:
+            # outside the lock: the callback runs right away if the render already finished
+            future.add_done_callback(lambda _: self._forget(key))
+
+        svg_text, timings = future.result()
+        return (svg_text, timings, coalesced)
+
+    def _forget(self, key: str):
+        with self.lock:
+            self.in_flight.pop(key, None)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server: "RenderHTTPServer | RenderUnixHTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_error(404)
+            return
+        self.send_body(200, b"ok", "text/plain")
+
+    def do_POST(self):
+        if self.path != "/render":
+            self.send_error(404)
+            return
+        start = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            svg_text, timings, coalesced = self.server.service.render(request)
+        except (ValueError, TypeError, IndexError) as e:
+            # json.JSONDecodeError is a ValueError; TypeError/IndexError come from malformed settings or names
+            self.send_body(400, str(e).encode(), "text/plain")
+            return
+        except Exception as e:
+            # anything else (e.g. a worker dying with BrokenProcessPool) still gets a response
+            self.log_error("render failed: %r", e)
+            self.send_body(500, f"The render failed: {e!r}".encode(), "text/plain")
+            return
+
+        headers = {f"X-Render-{stage}-Ms": f"{ms:.3f}" for stage, ms in timings.items()}
+        headers["X-Render-Total-Ms"] = f"{(time.perf_counter() - start) * 1000:.3f}"
+        headers["X-Render-Coalesced"] = "1" if coalesced else "0"
+        self.send_body(200, svg_text.encode(), "image/svg+xml", headers)
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # unix socket peers have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+class RenderHTTPServer(ThreadingHTTPServer):
+    def __init__(self, address: Tuple[str, int], service: RenderService, quiet: bool = False):
+        self.service = service
+        self.quiet = quiet
+        super().__init__(address, RenderRequestHandler)
+
+class RenderUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, service: RenderService, quiet: bool = False):
+        self.service = service
+        self.quiet = quiet
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, RenderRequestHandler)
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """an http.client connection to a RenderUnixHTTPServer
+    """
+    def __init__(self, path: str, timeout: float = 60):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+def request_render(
+    connection: http.client.HTTPConnection,
+    names: str,
+    layout: Dict[str, int] | None = None,
+    styling: Dict[str, Dict[str, str]] | None = None,
+) -> Tuple[str, Dict[str, str]]:
+    """client side: renders through a running service, returning the SVG and the response headers;
+    the connection is kept alive for further requests
+    """
+    body = json.dumps({"names": names, "layout": layout or {}, "styling": styling or {}}).encode()
+    connection.request("POST", "/render", body, {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    payload = response.read().decode()
+    if response.status != 200:
+        raise ValueError(payload)
+    return (payload, dict(response.getheaders()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve SVG renders over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", metavar="PATH", help="listen on a unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: one per core)")
+    parser.add_argument("--quiet", action="store_true", help="don't log every request")
+    args = parser.parse_args()
+
+    service = RenderService(args.workers)
+    if args.socket:
+        httpd = RenderUnixHTTPServer(args.socket, service, args.quiet)
+        print(f"Serving renders on {args.socket}")
+    else:
+        httpd = RenderHTTPServer((args.host, args.port), service, args.quiet)
+        print(f"Serving renders on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.shutdown()
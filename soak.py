@@ -0,0 +1,151 @@
+"""
+Headless soak test of the GUI render loop: drives thousands of simulated edits through
+mark_changes()/update_svg() and checks that memory and Qt objects stay bounded.
+
+Edits are a random mix of spacing changes (through the spin boxes), fill changes (which
+restyle without a full render), name edits (through the names model) and undo/redo. The
+render timers are stopped and each edit is rendered right away, with the user pausing
+every few edits so the full render replaces any bar preview. Usage is measured after a
+warm-up long enough to fill the undo history and again at the end; growth past the
+limits fails the run.
+
+Usage:
+    python3 soak.py --edits 5000
+    python3 soak.py names.txt --edits 2000 --max-rss-growth 32 --report soak.json
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+from typing import Tuple
+
+# no window is needed; set QT_QPA_PLATFORM to watch it run
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+
+from bench import make_content
+from data import process_names
+from diagnostics import Diagnostics, qt_object_counts, rss_bytes
+import gui
+from history import MAX_ENTRIES
+
+# (RSS, Python allocations, Qt objects)
+Usage = Tuple[int, int, int]
+
+def measure() -> Usage:
+    gc.collect()
+    return (rss_bytes(), tracemalloc.get_traced_memory()[0], sum(qt_object_counts().values()))
+
+class Soak:
+    def __init__(self, app: QApplication, window: gui.MainWindow, seed: int):
+        self.app = app
+        self.window = window
+        self.rng = random.Random(seed)
+        self.spacing_entries = list(window.spacing_settings.spacing_entries.values())
+
+    def edit(self):
+        kind = self.rng.choices(["spacing", "fill", "name", "history"], weights=[4, 3, 2, 1])[0]
+        if kind == "spacing":
+            spin_box = self.rng.choice(self.spacing_entries).value_edit
+            spin_box.setValue(max(1, spin_box.value() + self.rng.choice([-3, -1, 1, 3])))
+        elif kind == "fill":
+            # what dragging in a color dialog does
+            self.rng.choice([gui.styling.name_style, gui.styling.role_style, gui.styling.label_style]).fill = f"#{self.rng.randrange(2**24):06x}"
+            gui.mark_style_changes()
+        elif kind == "name":
+            model = gui.names_model
+            section = model.index(self.rng.randrange(model.rowCount()), 0)
+            if model.rowCount(section):
+                row = self.rng.randrange(model.rowCount(section))
+                model.setData(model.index(row, 0, section), f"Soak {self.rng.randrange(10**6)}")
+        elif self.rng.random() < 0.5:
+            self.window.edit_menu.undo()
+        else:
+            self.window.edit_menu.redo()
+
+    def render(self, pause: bool):
+        if pause:
+            # what the render loop sees once input stops: the full render replaces any bars
+            gui.last_change_time = 0.0
+            gui.svg_widget.preview_painted = 0.0
+        gui.update_svg()
+        gui.update_svg_style()
+        # delivers the paint
+        self.app.processEvents()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Soak-test the GUI render loop and check memory stays bounded.")
+    parser.add_argument("input", nargs="?", help="names file to edit (a synthetic roster if left out)")
+    parser.add_argument("--names", type=int, default=500, help="size of the synthetic roster")
+    parser.add_argument("--edits", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=MAX_ENTRIES + 100, help="edits before the baseline is measured; enough to fill the undo history")
+    parser.add_argument("--pause-every", type=int, default=4, metavar="N", help="let the full render through every N edits")
+    parser.add_argument("--max-rss-growth", type=float, default=32, metavar="MB")
+    parser.add_argument("--max-traced-growth", type=float, default=8, metavar="MB", help="limit on growth of live Python allocations")
+    parser.add_argument("--max-qt-growth", type=int, default=20, metavar="OBJECTS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", metavar="PATH", help="write every resource sample as JSON to PATH")
+    args = parser.parse_args()
+    if args.warmup >= args.edits:
+        parser.error("--warmup has to be smaller than --edits")
+
+    app = QApplication(sys.argv[:1])
+    window = gui.MainWindow()
+    window.resize(1200, 800)
+    window.show()
+    # renders are driven below instead
+    gui.svg_widget.timer.stop()
+    gui.svg_widget.style_timer.stop()
+
+    try:
+        if args.input:
+            # read like File > Open Names does
+            with open(args.input) as f:
+                gui.content = process_names(f.read())
+        else:
+            gui.content = make_content(args.names, max(1, args.names // 100))
+    except ValueError as e:
+        sys.exit(e.args[0])
+    gui.names_model.reload()
+    gui.mark_changes()
+    soak = Soak(app, window, args.seed)
+
+    diagnostics = Diagnostics()
+    diagnostics.start()
+    gui.diagnostics = diagnostics
+    soak.render(pause=True)
+    for i in range(args.edits):
+        if i == args.warmup:
+            soak.render(pause=True)
+            baseline = measure()
+        soak.edit()
+        soak.render(pause=i % args.pause_every == 0)
+    soak.render(pause=True)
+    end = measure()
+
+    rss_growth = (end[0] - baseline[0]) / 2**20
+    traced_growth = (end[1] - baseline[1]) / 2**20
+    qt_growth = end[2] - baseline[2]
+    print(diagnostics.report())
+    print(f"After {args.warmup} warm-up edits, {args.edits - args.warmup} more changed RSS by {rss_growth:+.1f} MB, "
+          f"Python allocations by {traced_growth:+.1f} MB and Qt objects by {qt_growth:+d}")
+    if args.report:
+        diagnostics.dump(args.report)
+    diagnostics.stop()
+
+    failures = []
+    if rss_growth > args.max_rss_growth:
+        failures.append(f"RSS grew {rss_growth:.1f} MB (limit {args.max_rss_growth} MB)")
+    if traced_growth > args.max_traced_growth:
+        failures.append(f"Python allocations grew {traced_growth:.1f} MB (limit {args.max_traced_growth} MB)")
+    if qt_growth > args.max_qt_growth:
+        failures.append(f"{qt_growth} more Qt objects (limit {args.max_qt_growth})")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
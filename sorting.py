@@ -0,0 +1,215 @@
+"""
+Sorting and grouping names within sections.
+
+Names are compared on one or more fields (last name, full name, role, or any function of
+the name and role), collated with the current LC_COLLATE locale after diacritics are
+stripped and case folded, so "Åberg" sorts with the A's and "émile" with "Emile". Sorts are
+stable: entries that tie on every field keep the order they were in.
+
+A NameSorter computes each entry's key once and keeps it, so sorting again after a few
+names changed only computes keys for the changed names, and resort() moves just those
+names into place.
+
+Usage:
+    content = sort_content(content, ["last", "first"])
+    content = sort_content(content, ["last"], split=150)    # "Cast (A–F)", "Cast (G–M)", ...
+
+    sorter = NameSorter(["last"], content.include_roles)
+    names = sorter.sort(section[1:])
+    names[12] = "New Name: Role"
+    sorter.resort(names, [12])
+"""
+from bisect import bisect_left
+import html
+import locale
+import re
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from data import Content
+
+# (name, role) -> the text to collate; role is None without roles. Fields get the folded name and role
+# (diacritics stripped, case folded)
+SortField = Callable[[str, str | None], str]
+
+# cached keys per sorter before the cache is cleared
+MAX_KEYS = 1000000
+
+# trailing words that aren't the last name
+NAME_SUFFIXES = {"jr", "jr.", "sr", "sr.", "ii", "iii", "iv"}
+
+# the combining diacritical mark blocks, which NFKD splits accents into
+_COMBINING_MARKS = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]+")
+
+def last_name(name: str, role: str | None) -> str:
+    """the last word that isn't a suffix, followed by the rest of the name for ties
+    """
+    rest, _, last = name.strip().rpartition(" ")
+    if last.casefold() not in NAME_SUFFIXES:
+        return f"{last} {rest}" if rest else last
+    words = name.split()
+    end = len(words)
+    while end > 1 and words[end - 1].casefold() in NAME_SUFFIXES:
+        end -= 1
+    if end == 0:
+        return ""
+    return " ".join([words[end - 1], *words[:end - 1], *words[end:]])
+
+def full_name(name: str, role: str | None) -> str:
+    return name
+
+def role_name(name: str, role: str | None) -> str:
+    return role or ""
+
+SORT_FIELDS: Dict[str, SortField] = {
+    "last": last_name,
+    "first": full_name,
+    "role": role_name,
+}
+
+def get_sort_field(field: str | SortField) -> SortField:
+    if callable(field):
+        return field
+    try:
+        return SORT_FIELDS[field]
+    except KeyError:
+        raise ValueError(f"Unknown sort field '{field}'. Choose one of: {', '.join(SORT_FIELDS)}.") from None
+
+def set_collation_locale(name: str):
+    """sets LC_COLLATE for the whole process; "" picks the user's default
+    """
+    try:
+        locale.setlocale(locale.LC_COLLATE, name)
+    except locale.Error:
+        raise ValueError(f"The locale '{name}' isn't available.") from None
+
+def strip_diacritics(text: str) -> str:
+    if text.isascii():
+        return text
+    return _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+
+def fold(text: str) -> str:
+    return strip_diacritics(text).casefold()
+
+def initial(folded: str) -> str:
+    """the letter a folded text is filed under; "#" for anything not starting with a letter
+    """
+    folded = folded.lstrip()
+    return folded[0].upper() if folded and folded[0].isalpha() else "#"
+
+class NameSorter:
+    """sorts a section's entries ("Name" or "Name: Role", escaped like Content) on fields in order of priority;
+    keys are cached per entry, so a sorter should be kept while the same names are sorted repeatedly
+    """
+    def __init__(self, fields: Sequence[str | SortField], include_roles: bool):
+        if not fields:
+            raise ValueError("Sorting needs at least one field.")
+        self.fields = [get_sort_field(field) for field in fields]
+        self.include_roles = include_roles
+        self.keys: Dict[str, Tuple[str, ...]] = {}
+        # entry -> the letter it's filed under, filled in with its key
+        self.initials: Dict[str, str] = {}
+
+    def add_keys(self, entries: Iterable[str]):
+        """computes the keys of entries that don't have one yet, in one pass
+        """
+        requested = list(dict.fromkeys(entries))
+        missing = [entry for entry in requested if entry not in self.keys]
+        if len(self.keys) + len(missing) > MAX_KEYS:
+            # every requested entry needs its key afterwards, not just the ones that were missing
+            self.keys.clear()
+            self.initials.clear()
+            missing = requested
+        fields = self.fields
+        strxfrm = locale.strxfrm
+        for entry in missing:
+            # the whole entry is folded at once; folding doesn't touch the ": " between name and role
+            folded_entry = fold(html.unescape(entry) if "&" in entry else entry)
+            if self.include_roles:
+                name, _, role = folded_entry.partition(": ")
+            else:
+                name, role = folded_entry, None
+            folded = [field(name, role) for field in fields]
+            self.keys[entry] = tuple(strxfrm(text) for text in folded)
+            self.initials[entry] = initial(folded[0])
+
+    def key(self, entry: str) -> Tuple[str, ...]:
+        key = self.keys.get(entry)
+        if key is None:
+            self.add_keys((entry,))
+            key = self.keys[entry]
+        return key
+
+    def initial(self, entry: str) -> str:
+        """the letter an entry is filed under by its first field
+        """
+        letter = self.initials.get(entry)
+        if letter is None:
+            self.add_keys((entry,))
+            letter = self.initials[entry]
+        return letter
+
+    def sort(self, names: Iterable[str]) -> List[str]:
+        names = list(names)
+        self.add_keys(names)
+        return sorted(names, key=self.keys.__getitem__)
+
+    def resort(self, names: List[str], changed: Iterable[int]) -> List[str]:
+        """moves the entries at the changed indexes of an otherwise sorted list into place, in place;
+        ties end up in the order sort() would give them, i.e. the order they had in names
+        """
+        changed = sorted(set(changed))
+        moved = [(i, names[i]) for i in changed]
+        for i in reversed(changed):
+            del names[i]
+        # where each remaining entry was before the changed ones were taken out, to order ties by
+        skipped = set(changed)
+        indexes = [i for i in range(len(names) + len(changed)) if i not in skipped]
+        keys = self.keys
+        for i, entry in moved:
+            self.add_keys((entry,))
+            at = bisect_left(range(len(names)), (keys[entry], i), key=lambda position: (keys[names[position]], indexes[position]))
+            names.insert(at, entry)
+            indexes.insert(at, i)
+        return names
+
+    def split(self, title: str, names: Sequence[str], max_names: int) -> List[List[str]]:
+        """splits sorted names into sections of runs of whole letters with at most max_names names each, where
+        a single letter with more names than that gets a section of its own; titles get the letter range, e.g. "Cast (A–F)"
+        """
+        self.add_keys(names)
+        groups: List[Tuple[str, List[str]]] = []
+        for entry in names:
+            letter = self.initials[entry]
+            if not groups or groups[-1][0] != letter:
+                groups.append((letter, []))
+            groups[-1][1].append(entry)
+
+        sections = []
+        start = 0
+        while start < len(groups):
+            stop = start + 1
+            count = len(groups[start][1])
+            while stop < len(groups) and count + len(groups[stop][1]) <= max_names:
+                count += len(groups[stop][1])
+                stop += 1
+            first, last = groups[start][0], groups[stop - 1][0]
+            letters = first if first == last else f"{first}–{last}"
+            sections.append([f"{title} ({letters})", *(entry for _, entries in groups[start:stop] for entry in entries)])
+            start = stop
+        return sections
+
+def sort_content(content: Content, fields: Sequence[str | SortField], split: int = 0, sorter: NameSorter | None = None) -> Content:
+    """a copy of content with every section's names sorted, and, if split is set, sections with more than
+    split names split alphabetically; pass a sorter to reuse its cached keys between calls
+    """
+    if sorter is None:
+        sorter = NameSorter(fields, content.include_roles)
+    sections = []
+    for section in content.names:
+        names = sorter.sort(section[1:])
+        if split and len(names) > split:
+            sections.extend(sorter.split(section[0], names, split))
+        else:
+            sections.append([section[0], *names])
+    return Content(sections, list(content.subtitles), content.include_roles)